@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+This module measures the throughput, in records per second, of the
+redaction of PII fields in log records similar to the ones main() logs,
+of both RedactingFormatter engines with 5, 50 and 500 fields, and of the
+calls to the synchronous and asynchronous loggers.
+
+Usage: ./benchmark.py [number of records]
+"""
+
+import logging
+import os
+import re
+import sys
+import time
+from typing import Callable, List
+
+from filtered_logger import (PII_FIELDS, RedactingFormatter, filter_datum,
+                             get_logger, stop_logger)
+
+
+def make_messages(count: int) -> List[str]:
+    """
+    Builds log lines shaped like the rows of the users table.
+
+    Args:
+        count: The number of lines to build.
+
+    Returns:
+        A list of log lines.
+    """
+    return [
+        f"name=User {i}; email=user{i}@example.com; phone=555-{i:07d}; "
+        f"ssn={i:09d}; password=hash{i}; ip=10.0.{i // 256 % 256}.{i % 256}; "
+        f"last_login=2019-11-14 06:16:24; user_agent=Mozilla/5.0;"
+        for i in range(count)
+    ]
+
+
+def make_wide_messages(count: int, fields: List[str]) -> List[str]:
+    """
+    Builds log lines holding every field, and as many fields to keep.
+
+    Args:
+        count: The number of lines to build.
+        fields: The fields to redact.
+
+    Returns:
+        A list of log lines.
+    """
+    return [
+        "; ".join(f"{field}=value {i}; kept_{field}=value {i}"
+                  for field in fields) + ";"
+        for i in range(count)
+    ]
+
+
+def uncached_filter_datum(
+    fields: List[str], redaction: str, message: str, separator: str
+) -> str:
+    """
+    Obfuscates fields by building the pattern on every call, for
+    comparison.
+    """
+    return re.sub(f'({"|".join(fields)})=[^{separator}]*',
+                  f"\\1={redaction}", message)
+
+
+def measure(name: str, redact: Callable[[str], str],
+            messages: List[str]) -> None:
+    """
+    Prints the number of messages redacted per second.
+
+    Args:
+        name: The name of the measured function.
+        redact: A function redacting one message.
+        messages: The messages to redact.
+    """
+    start = time.perf_counter()
+    for message in messages:
+        redact(message)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {len(messages) / elapsed:>12,.0f} records/sec")
+
+
+def main() -> None:
+    """
+    Runs the benchmarks.
+    """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    messages = make_messages(count)
+    formatter = RedactingFormatter(PII_FIELDS)
+    separator = RedactingFormatter.SEPARATOR
+    redaction = RedactingFormatter.REDACTION
+
+    measure("uncached filter_datum",
+            lambda m: uncached_filter_datum(PII_FIELDS, redaction, m,
+                                            separator), messages)
+    measure("filter_datum",
+            lambda m: filter_datum(PII_FIELDS, redaction, m, separator),
+            messages)
+
+    measure_format("RedactingFormatter", formatter, messages)
+
+    for field_count in (5, 50, 500):
+        fields = [f"field{i}" for i in range(field_count)]
+        messages = make_wide_messages(max(count * 5 // field_count, 100),
+                                      fields)
+        print(f"{field_count} fields, {len(messages[0])} characters/record")
+        for engine in RedactingFormatter.ENGINES:
+            formatter = RedactingFormatter(fields, engine)
+            measure_format(f"  {engine} engine", formatter, messages)
+
+    messages = make_messages(count)
+    for asynchronous in (False, True):
+        measure_logger(asynchronous, messages)
+
+
+def measure_format(name: str, formatter: RedactingFormatter,
+                   messages: List[str]) -> None:
+    """
+    Prints the number of log records formatted per second.
+
+    Args:
+        name: The name of the measured formatter.
+        formatter: The formatter.
+        messages: The messages of the log records.
+    """
+    records = iter([logging.LogRecord("user_data", logging.INFO, __file__, 0,
+                                      message, None, None)
+                    for message in messages])
+    measure(name, lambda m: formatter.format(next(records)), messages)
+
+
+def measure_logger(asynchronous: bool, messages: List[str]) -> None:
+    """
+    Prints the number of logger.info calls per second, writing to
+    os.devnull, then the time left to write the queued records.
+
+    Args:
+        asynchronous: Whether the logger is asynchronous.
+        messages: The messages to log.
+    """
+    existing = list(logging.getLogger("user_data").handlers)
+    logger = get_logger(asynchronous)
+    handler, = [h for h in logger.handlers if h not in existing]
+    listener = getattr(handler, "listener", None)
+    stream_handler = listener.handler if listener else handler
+    with open(os.devnull, "w") as devnull:
+        stream_handler.setStream(devnull)
+        name = "asynchronous" if asynchronous else "synchronous"
+        measure(f"{name} logger.info", logger.info, messages)
+        start = time.perf_counter()
+        stop_logger(logger)
+        if listener:
+            print(f"  queue drained in {time.perf_counter() - start:.3f}s")
+    logger.removeHandler(handler)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,15 +6,44 @@ logging formatter, and database connection functionality.
 """
 
 import re
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from typing import Iterator, List, Optional, Tuple
 import logging
+import logging.handlers
 import mysql.connector
 import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
 
 
 # PII fields to be redacted
 PII_FIELDS = ("name", "email", "phone", "ssn", "password")
 
+# asynchronous logging: records waiting for the listener thread, records
+# written at once, and what a full queue does ("block" or "drop")
+LOG_QUEUE_SIZE = int(os.environ.get("PERSONAL_DATA_LOG_QUEUE_SIZE", 10000))
+LOG_BATCH_SIZE = int(os.environ.get("PERSONAL_DATA_LOG_BATCH_SIZE", 100))
+LOG_QUEUE_POLICY = os.environ.get("PERSONAL_DATA_LOG_QUEUE_POLICY", "block")
+
+# export of main(): "all" rows of one query, "stream" them by pages of
+# EXPORT_PAGE_SIZE rows ordered by the unique, non-null EXPORT_KEY column,
+# fetched by EXPORT_BATCH_SIZE rows, or "partition" the numeric key range
+# between EXPORT_WORKERS processes (0: one per core), writing a file per
+# partition in EXPORT_DIRECTORY or, when unset, merging them to stderr
+EXPORT_MODES = ("all", "stream", "partition")
+EXPORT_MODE = os.environ.get("PERSONAL_DATA_EXPORT_MODE", "all")
+EXPORT_KEY = os.environ.get("PERSONAL_DATA_EXPORT_KEY", "id")
+EXPORT_PAGE_SIZE = int(os.environ.get("PERSONAL_DATA_EXPORT_PAGE_SIZE",
+                                      10000))
+EXPORT_BATCH_SIZE = int(os.environ.get("PERSONAL_DATA_EXPORT_BATCH_SIZE",
+                                       1000))
+EXPORT_WORKERS = int(os.environ.get("PERSONAL_DATA_EXPORT_WORKERS", 0))
+EXPORT_DIRECTORY = os.environ.get("PERSONAL_DATA_EXPORT_DIRECTORY")
+
 
 def filter_datum(
     fields: List[str], redaction: str, message: str, separator: str
@@ -32,8 +61,119 @@ def filter_datum(
     Returns:
         The log message with specified fields obfuscated.
     """
-    return re.sub(f'({"|".join(fields)})=[^{separator}]*',
-                  f"\\1={redaction}", message)
+    pattern = RedactingFormatter.pattern(fields, separator)
+    return pattern.sub(f"\\1={redaction}", message)
+
+
+class SplitRedactor:
+    """Redacts fields without a regex
+
+    The line is split once on the separator, the text before the "=" of
+    each part is looked up in a frozenset of the fields and the line is
+    rebuilt with a single join. The output is the same as filter_datum's
+    for field names that are plain text (no regex syntax, "=" or
+    separator), a one-character separator and a redaction without
+    backslashes.
+    """
+
+    # keys remembered as ending with a field or not
+    MAX_KEYS = 10000
+
+    def __init__(self, fields: List[str], redaction: str, separator: str):
+        """
+        Initialize the redactor.
+
+        Args:
+            fields: A list of strings representing all fields to obfuscate.
+            redaction: A string representing by what the field will be
+            obfuscated.
+            separator: A string representing the character separating fields
+            in the log line.
+
+        Raises:
+            ValueError: If a field or the separator can't be handled.
+        """
+        if len(separator) != 1:
+            raise ValueError("separator must be one character")
+        for field in fields:
+            if not field or re.escape(field) != field or \
+                    "=" in field or separator in field:
+                raise ValueError(f"field {field!r} must be plain text")
+        self.fields = frozenset(fields)
+        # field lengths, longest first: the regex matches the field
+        # starting leftmost, i.e. the longest one ending before the "="
+        self.lengths = sorted({len(field) for field in fields},
+                              reverse=True)
+        self.redaction = redaction
+        self.separator = separator
+        # key -> whether it ends with a field: log lines repeat their keys
+        self._keys = {}
+
+    def ends_with_field(self, key: str) -> bool:
+        """
+        Tells if a key ends with a field, as "username" ends with "name".
+
+        Args:
+            key: A string representing the text before a "=".
+
+        Returns:
+            True if the key ends with one of the fields.
+        """
+        if key in self.fields:
+            return True
+        for length in self.lengths:
+            if length < len(key) and key[-length:] in self.fields:
+                return True
+        return False
+
+    def redact_after(self, part: str, equal: int) -> str:
+        """
+        Obfuscates the value of the first field ending before a "=" placed
+        after the position equal, i.e. in a value containing "=".
+
+        Args:
+            part: A string representing one field of the log line.
+            equal: The position of the first "=" of part.
+
+        Returns:
+            The part with its field obfuscated, or unchanged.
+        """
+        equal = part.find("=", equal + 1)
+        while equal != -1:
+            if self.ends_with_field(part[:equal]):
+                return part[:equal + 1] + self.redaction
+            equal = part.find("=", equal + 1)
+        return part
+
+    def __call__(self, message: str) -> str:
+        """
+        Obfuscates the fields of a log line.
+
+        Args:
+            message: A string representing the log line.
+
+        Returns:
+            The log message with the fields obfuscated.
+        """
+        keys = self._keys
+        redacted_value = "=" + self.redaction
+        parts = []
+        append = parts.append
+        for part in message.split(self.separator):
+            key, equal, value = part.partition("=")
+            if equal:
+                found = keys.get(key)
+                if found is None:
+                    found = self.ends_with_field(key)
+                    if len(keys) < self.MAX_KEYS:
+                        keys[key] = found
+                if found:
+                    append(key + redacted_value)
+                    continue
+                if "=" in value:
+                    part = self.redact_after(part, len(key))
+            append(part)
+        return self.separator.join(parts)
 
 
 class RedactingFormatter(logging.Formatter):
@@ -46,17 +186,69 @@ class RedactingFormatter(logging.Formatter):
     REDACTION = "***"
     FORMAT = "[HOLBERTON] %(name)s %(levelname)s %(asctime)-15s: %(message)s"
     SEPARATOR = ";"
+    # "regex": one pattern alternating the fields (filter_datum)
+    # "split": SplitRedactor, faster but limited to plain text fields
+    ENGINES = ("regex", "split")
+
+    # compiled redaction patterns kept, the least recently used ones
+    # beyond it are compiled again
+    PATTERN_CACHE_SIZE = 128
 
-    def __init__(self, fields: List[str]):
+    def __init__(self, fields: List[str], engine: str = "regex"):
         """
         Initialize the RedactingFormatter with fields to redact.
 
         Args:
             fields: A list of strings representing the fields
             to redact in log messages.
+            engine: The redaction engine, one of ENGINES.
+
+        Raises:
+            ValueError: If the engine is unknown or can't redact fields.
         """
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        if engine == "regex":
+            self._pattern = self.pattern(fields, self.SEPARATOR)
+            self._redacted_value = f"={self.REDACTION}"
+            self._redact_message = partial(self._pattern.sub, self._redact)
+        elif engine == "split":
+            self._redact_message = SplitRedactor(fields, self.REDACTION,
+                                                 self.SEPARATOR)
+        else:
+            raise ValueError(f"engine must be one of {self.ENGINES}")
+
+    @classmethod
+    def pattern(cls, fields: List[str], separator: str) -> re.Pattern:
+        """
+        Return the compiled pattern matching the values of fields,
+        cached by fields and separator.
+
+        Args:
+            fields: A list of strings representing the fields to match.
+            separator: A string representing the character separating fields
+            in the log line.
+
+        Returns:
+            The compiled pattern, whose first group is the field name.
+        """
+        return cls._compile(tuple(fields), separator)
+
+    @staticmethod
+    @lru_cache(maxsize=PATTERN_CACHE_SIZE)
+    def _compile(fields: Tuple[str, ...], separator: str) -> re.Pattern:
+        """
+        Compile the pattern matching the values of fields.
+
+        Args:
+            fields: A tuple of strings representing the fields to match.
+            separator: A string representing the character separating fields
+            in the log line.
+
+        Returns:
+            The compiled pattern, whose first group is the field name.
+        """
+        return re.compile(f'({"|".join(fields)})=[^{separator}]*')
 
     def format(self, record: logging.LogRecord) -> str:
         """
@@ -68,16 +260,249 @@ class RedactingFormatter(logging.Formatter):
         Returns:
             A formatted string with sensitive information redacted.
         """
-        record.msg = filter_datum(
-            self.fields, self.REDACTION, record.getMessage(), self.SEPARATOR
-        )
+        record.msg = self._redact_message(record.getMessage())
         return super(RedactingFormatter, self).format(record)
 
+    def _redact(self, match: re.Match) -> str:
+        """
+        Return the replacement of one field: a function is faster than
+        a "\\1=..." template, which is expanded again for every match.
+
+        Args:
+            match: The match of one field and its value.
+
+        Returns:
+            The field name followed by the redacted value.
+        """
+        return match[1] + self._redacted_value
+
+
+class BatchStreamHandler(logging.StreamHandler):
+    """Writes a batch of records with a single write and flush"""
+
+    def emit_batch(self, records: List[logging.LogRecord]) -> None:
+        """
+        Format the records and write them to the stream.
+
+        Args:
+            records: The LogRecord instances to write, in order.
+        """
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record) + self.terminator)
+            except Exception:
+                self.handleError(record)
+        if not lines:
+            return
+        self.acquire()
+        try:
+            self.stream.write("".join(lines))
+            self.flush()
+        except Exception:
+            self.handleError(records[-1])
+        finally:
+            self.release()
+
+
+class BatchingQueueListener:
+    """Listener thread draining the queue into a BatchStreamHandler
+
+    Each wake-up takes every record already queued, up to batch_size, so
+    the stream is written once per batch instead of once per record. The
+    records dropped because the queue was full are reported by a warning
+    written with the next batch.
+    """
+
+    _SENTINEL = None
+
+    def __init__(self, log_queue: queue.Queue, handler: BatchStreamHandler,
+                 batch_size: int = 100):
+        """
+        Initialize the listener.
+
+        Args:
+            log_queue: The queue filled by a BoundedQueueHandler.
+            handler: The handler redacting, formatting and writing records.
+            batch_size: The maximum number of records written at once.
+        """
+        self.queue = log_queue
+        self.handler = handler
+        self.batch_size = max(batch_size, 1)
+        self.dropped = 0
+        self._reported = 0
+        self._dropped_lock = threading.Lock()
+        self._thread = None
+        self.stopped = False
+
+    def start(self) -> None:
+        """
+        Start the listener thread.
+        """
+        self._thread = threading.Thread(target=self._monitor, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Write the queued records, then stop the listener thread: the
+        records handled after that are written synchronously.
+        """
+        if self.stopped:
+            return
+        self.stopped = True
+        if self._thread is not None:
+            self.queue.put(self._SENTINEL)
+            self._thread.join()
+            self._thread = None
+        # records enqueued while the listener was stopping
+        records = []
+        while True:
+            try:
+                records.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        self.write([record for record in records
+                    if record is not self._SENTINEL])
+
+    def count_dropped(self) -> None:
+        """
+        Count a record dropped because the queue was full.
+        """
+        with self._dropped_lock:
+            self.dropped += 1
+
+    def write(self, records: List[logging.LogRecord]) -> None:
+        """
+        Write the records the handler accepts, after a warning if records
+        were dropped since the last one.
+
+        Args:
+            records: The LogRecord instances to write, in order.
+        """
+        handler = self.handler
+        records = [record for record in records
+                   if record.levelno >= handler.level and
+                   handler.filter(record)]
+        with self._dropped_lock:
+            dropped = self.dropped - self._reported
+            self._reported = self.dropped
+        if dropped:
+            records.insert(0, logging.LogRecord(
+                "user_data", logging.WARNING, __file__, 0,
+                f"{dropped} log records dropped: the queue was full",
+                None, None))
+        handler.emit_batch(records)
+
+    def _monitor(self) -> None:
+        """
+        Write the queued records by batches until the sentinel is read.
+        """
+        log_queue = self.queue
+        while True:
+            records = [log_queue.get()]
+            while len(records) < self.batch_size:
+                try:
+                    records.append(log_queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopped = self._SENTINEL in records
+            self.write([record for record in records
+                        if record is not self._SENTINEL])
+            if stopped:
+                return
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records without formatting them
+
+    Redaction and formatting are left to the listener thread: the caller
+    only merges the arguments into the message and enqueues the record.
+    When the queue is full, the "block" policy waits for the listener
+    while the "drop" policy discards the record and counts it. Once the
+    handler is closed, records are written synchronously.
+    """
+
+    POLICIES = ("block", "drop")
 
-def get_logger() -> logging.Logger:
+    def __init__(self, listener: BatchingQueueListener,
+                 policy: str = "block"):
+        """
+        Initialize the handler.
+
+        Args:
+            listener: The listener reading the bounded queue.
+            policy: What to do when the queue is full, one of POLICIES.
+
+        Raises:
+            ValueError: If the policy is unknown.
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"policy must be one of {self.POLICIES}")
+        super(BoundedQueueHandler, self).__init__(listener.queue)
+        self.listener = listener
+        self.policy = policy
+
+    @property
+    def dropped(self) -> int:
+        """
+        The number of records dropped because the queue was full.
+        """
+        return self.listener.dropped
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Merge the arguments into the message, as they may change before
+        the listener formats the record.
+
+        Args:
+            record: A LogRecord instance representing the event being logged.
+
+        Returns:
+            The record to enqueue.
+        """
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """
+        Put the record in the queue, following the policy when it is full,
+        or write it if the listener is stopped.
+
+        Args:
+            record: A LogRecord instance representing the event being logged.
+        """
+        if self.listener.stopped:
+            self.listener.write([record])
+        elif self.policy == "block":
+            self.queue.put(record)
+        else:
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self.listener.count_dropped()
+
+    def close(self) -> None:
+        """
+        Write the queued records and stop the listener: called for every
+        handler by logging.shutdown() when the interpreter exits.
+        """
+        self.listener.stop()
+        super(BoundedQueueHandler, self).close()
+
+
+def get_logger(asynchronous: bool = False) -> logging.Logger:
     """
     Creates and configures a logger for user data.
 
+    Args:
+        asynchronous: Whether records are redacted and written by a
+        listener thread, the caller only enqueueing them. The queue is
+        sized by LOG_QUEUE_SIZE, written by LOG_BATCH_SIZE records and
+        full queues follow LOG_QUEUE_POLICY. The queued records are
+        written by stop_logger() or when the interpreter exits.
+
     Returns:
         A logging.Logger object configured to redact sensitive information.
     """
@@ -85,6 +510,15 @@ def get_logger() -> logging.Logger:
     logger.setLevel(logging.INFO)
     logger.propagate = False
 
+    if asynchronous:
+        stream_handler = BatchStreamHandler()
+        stream_handler.setFormatter(RedactingFormatter(PII_FIELDS))
+        listener = BatchingQueueListener(queue.Queue(LOG_QUEUE_SIZE),
+                                         stream_handler, LOG_BATCH_SIZE)
+        listener.start()
+        logger.addHandler(BoundedQueueHandler(listener, LOG_QUEUE_POLICY))
+        return logger
+
     stream_handler = logging.StreamHandler()
     stream_handler.setFormatter(RedactingFormatter(PII_FIELDS))
 
@@ -93,6 +527,20 @@ def get_logger() -> logging.Logger:
     return logger
 
 
+def stop_logger(logger: logging.Logger) -> None:
+    """
+    Writes the queued records of the asynchronous handlers of a logger,
+    then removes and closes them.
+
+    Args:
+        logger: A logger returned by get_logger().
+    """
+    for handler in list(logger.handlers):
+        if isinstance(handler, BoundedQueueHandler):
+            logger.removeHandler(handler)
+            handler.close()
+
+
 def get_db() -> mysql.connector.connection.MySQLConnection:
     """
     Connects to the MySQL database using credentials
@@ -113,11 +561,229 @@ def get_db() -> mysql.connector.connection.MySQLConnection:
     return connection
 
 
+def placeholder(db) -> str:
+    """
+    Return the query parameter marker of the database driver: "?" for
+    qmark drivers such as sqlite3, "%s" for mysql.connector.
+
+    Args:
+        db: A DB-API connection.
+
+    Returns:
+        The marker of one positional parameter.
+    """
+    names = type(db).__module__.split(".")
+    for end in range(len(names), 0, -1):
+        module = sys.modules.get(".".join(names[:end]))
+        if hasattr(module, "paramstyle"):
+            return "?" if module.paramstyle == "qmark" else "%s"
+    return "%s"
+
+
+def iter_user_batches(
+    db, key: str = EXPORT_KEY, page_size: int = EXPORT_PAGE_SIZE,
+    batch_size: int = EXPORT_BATCH_SIZE, lower=None, upper=None
+) -> Iterator[Tuple[List[str], List[tuple]]]:
+    """
+    Stream the rows of the users table by keyset pagination: each page is
+    a query for the rows whose key follows the last one read, and its rows
+    are fetched by batches, so at most one batch is held in memory.
+
+    Args:
+        db: A DB-API connection.
+        key: The name of a unique, non-null column ordering the pages.
+        page_size: The number of rows of one query.
+        batch_size: The number of rows of one fetchmany.
+        lower: The smallest key to read, if any.
+        upper: The largest key to read, if any.
+
+    Yields:
+        The column names and a batch of rows.
+
+    Raises:
+        ValueError: If key isn't a column name.
+    """
+    if not re.fullmatch(r"\w+", key):
+        raise ValueError(f"invalid key column {key!r}")
+    marker = placeholder(db)
+    upper_bound = [(f"{key} <= {marker}", upper)] if upper is not None else []
+    conditions = upper_bound
+    if lower is not None:
+        conditions = [(f"{key} >= {marker}", lower)] + upper_bound
+    while True:
+        where = " AND ".join(condition for condition, _ in conditions)
+        where = f"WHERE {where} " if where else ""
+        cursor = db.cursor()
+        cursor.execute(
+            f"SELECT * FROM users {where}ORDER BY {key} LIMIT {page_size};",
+            tuple(value for _, value in conditions))
+        fields = [i[0] for i in cursor.description]
+        index = fields.index(key)
+        count = 0
+        try:
+            rows = cursor.fetchmany(batch_size)
+            while rows:
+                count += len(rows)
+                last = rows[-1][index]
+                yield fields, rows
+                rows = cursor.fetchmany(batch_size)
+        finally:
+            cursor.close()
+        if count < page_size:
+            return
+        conditions = [(f"{key} > {marker}", last)] + upper_bound
+
+
+def partition_keys(db, key: str, count: int) -> List[Tuple[int, int]]:
+    """
+    Split the range of a numeric key of the users table into count ranges
+    of the same width.
+
+    Args:
+        db: A DB-API connection.
+        key: The name of a unique, non-null, integer column.
+        count: The number of ranges.
+
+    Returns:
+        The smallest and largest key of each range, none when the table
+        is empty.
+
+    Raises:
+        ValueError: If key isn't a column name or an integer column.
+    """
+    if not re.fullmatch(r"\w+", key):
+        raise ValueError(f"invalid key column {key!r}")
+    cursor = db.cursor()
+    cursor.execute(f"SELECT MIN({key}), MAX({key}) FROM users;")
+    lowest, highest = cursor.fetchone()
+    cursor.close()
+    if lowest is None:
+        return []
+    if not isinstance(lowest, int) or not isinstance(highest, int):
+        raise ValueError(f"key column {key!r} must hold integers")
+    width = -(-(highest - lowest + 1) // count)
+    return [(lower, min(lower + width - 1, highest))
+            for lower in range(lowest, highest + 1, width)]
+
+
+def export_partition(path: str, lower: int, upper: int) -> int:
+    """
+    Write the redacted rows of one key range to a file, in the format of
+    the logger, with a connection of its own: run by the worker processes.
+
+    Args:
+        path: The path of the file to write.
+        lower: The smallest key to read.
+        upper: The largest key to read.
+
+    Returns:
+        The number of rows written.
+    """
+    db = get_db()
+    count = 0
+    with open(path, "w") as stream:
+        handler = BatchStreamHandler(stream)
+        handler.setFormatter(RedactingFormatter(PII_FIELDS))
+        try:
+            for fields, rows in iter_user_batches(
+                    db, EXPORT_KEY, EXPORT_PAGE_SIZE, EXPORT_BATCH_SIZE,
+                    lower, upper):
+                handler.emit_batch([
+                    logging.LogRecord("user_data", logging.INFO, __file__, 0,
+                                      format_row(fields, row), None, None)
+                    for row in rows])
+                count += len(rows)
+        finally:
+            db.close()
+    return count
+
+
+def export_partitions(directory: Optional[str] = EXPORT_DIRECTORY,
+                      workers: int = EXPORT_WORKERS) -> int:
+    """
+    Export the users table by key ranges exported in parallel, one worker
+    process and connection per range at a time.
+
+    Args:
+        directory: The directory of the users-NNNN.log file of each range,
+        or None to write the ranges to stderr in key order.
+        workers: The number of worker processes and of ranges, 0 for the
+        number of cores.
+
+    Returns:
+        The number of rows exported.
+    """
+    workers = workers or os.cpu_count()
+    db = get_db()
+    try:
+        partitions = partition_keys(db, EXPORT_KEY, workers)
+    finally:
+        db.close()
+    merged = directory is None
+    if merged:
+        directory = tempfile.mkdtemp(prefix="users-")
+    paths = [os.path.join(directory, f"users-{index:04d}.log")
+             for index in range(len(partitions))]
+    try:
+        with ProcessPoolExecutor(workers) as executor:
+            counts = executor.map(export_partition, paths,
+                                  [lower for lower, _ in partitions],
+                                  [upper for _, upper in partitions])
+            total = 0
+            for path, count in zip(paths, counts):
+                total += count
+                if merged:
+                    with open(path) as stream:
+                        shutil.copyfileobj(stream, sys.stderr)
+            sys.stderr.flush()
+    finally:
+        if merged:
+            shutil.rmtree(directory)
+    return total
+
+
+def format_row(fields: List[str], row: tuple) -> str:
+    """
+    Return a row of the users table as a log line.
+
+    Args:
+        fields: The column names.
+        row: The values of the columns.
+
+    Returns:
+        The "field=value;" pairs of the row, separated by spaces.
+    """
+    return "".join(f"{f}={str(r)}; " for r, f in zip(row, fields)).strip()
+
+
 def main() -> None:
     """
     Main function to retrieve and display filtered user data from the database.
+
+    With PERSONAL_DATA_EXPORT_MODE=stream, the rows are read by
+    iter_user_batches and logged by the asynchronous logger, which writes
+    them by batches. With PERSONAL_DATA_EXPORT_MODE=partition, they are
+    exported by export_partitions.
     """
+    if EXPORT_MODE not in EXPORT_MODES:
+        raise ValueError(f"export mode must be one of {EXPORT_MODES}")
+    if EXPORT_MODE == "partition":
+        export_partitions(EXPORT_DIRECTORY, EXPORT_WORKERS)
+        return
     db = get_db()
+
+    if EXPORT_MODE == "stream":
+        logger = get_logger(asynchronous=True)
+        try:
+            for fields, rows in iter_user_batches(
+                    db, EXPORT_KEY, EXPORT_PAGE_SIZE, EXPORT_BATCH_SIZE):
+                for row in rows:
+                    logger.info(format_row(fields, row))
+        finally:
+            stop_logger(logger)
+            db.close()
+        return
+
     cursor = db.cursor()
     cursor.execute("SELECT * FROM users;")
     fields = [i[0] for i in cursor.description]
@@ -125,8 +791,7 @@ def main() -> None:
     logger = get_logger()
 
     for row in cursor:
-        str_row = "".join(f"{f}={str(r)}; " for r, f in zip(row, fields))
-        logger.info(str_row.strip())
+        logger.info(format_row(fields, row))
 
     cursor.close()
     db.close()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Tests of filtered_logger: the split redactor against filter_datum, the
+asynchronous logging, and the exports, with a SQLite database standing in
+for MySQL.
+
+Usage: python3 -m unittest test_filtered_logger
+"""
+
+import io
+import logging
+import multiprocessing
+import os
+import queue
+import sqlite3
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from unittest.mock import patch
+
+import filtered_logger
+from filtered_logger import (BatchingQueueListener, BatchStreamHandler,
+                             BoundedQueueHandler, RedactingFormatter,
+                             SplitRedactor, export_partitions, filter_datum,
+                             iter_user_batches, placeholder)
+
+
+def create_users(db: sqlite3.Connection, count: int) -> None:
+    """
+    Creates the users table with count rows, whose ids are 1 to count.
+
+    Args:
+        db: A SQLite connection.
+        count: The number of rows.
+    """
+    db.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, "
+               "email TEXT, phone TEXT, ssn TEXT, password TEXT, ip TEXT)")
+    db.executemany("INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?)", (
+        (i, f"User {i}", f"user{i}@example.com", f"555-{i:07d}",
+         f"{i:09d}", f"hash{i}", f"10.0.0.{i % 256}")
+        for i in range(1, count + 1)))
+    db.commit()
+
+
+class TestSplitRedactor(unittest.TestCase):
+    """Tests of SplitRedactor against filter_datum"""
+
+    FIELDS = ["name", "email", "password"]
+
+    def assertSameAsFilterDatum(self, message: str,
+                                separator: str = ";") -> None:
+        """Checks that SplitRedactor and filter_datum redact message alike"""
+        redactor = SplitRedactor(self.FIELDS, "***", separator)
+        self.assertEqual(redactor(message),
+                         filter_datum(self.FIELDS, "***", message, separator))
+
+    def test_plain_fields(self):
+        """The fields are redacted, the other keys are kept"""
+        self.assertSameAsFilterDatum(
+            "name=bob;email=bob@x.com;ip=10.0.0.1;password=p;")
+        self.assertSameAsFilterDatum("name=bob|ip=1|email=x", "|")
+
+    def test_suffix_keys(self):
+        """A key ending with a field is redacted"""
+        for message in ("username=al;", "user_email=a@x;ip=1;",
+                        "nickname=al;name=bob;", "names=al;", "aname=;"):
+            with self.subTest(message=message):
+                self.assertSameAsFilterDatum(message)
+
+    def test_values_containing_equal(self):
+        """A field ending before a later "=" of the value is redacted"""
+        for message in ("a=xname=1;", "a=b=c;", "ip=1=name=2;",
+                        "a=x=email=y;name=z;", "name=a=b;"):
+            with self.subTest(message=message):
+                self.assertSameAsFilterDatum(message)
+
+    def test_space_after_separator(self):
+        """The spaces after a separator are part of the next key"""
+        self.assertSameAsFilterDatum("ip=1; name=bob; email=x;")
+        self.assertSameAsFilterDatum("ip=1;  password = p;")
+
+    def test_empty_keys_and_values(self):
+        """Empty keys, values and parts are kept or redacted alike"""
+        for message in ("=v;", "name=;", ";;", "=;name=;=", "", "name",
+                        "ip;name=x"):
+            with self.subTest(message=message):
+                self.assertSameAsFilterDatum(message)
+
+    def test_invalid_fields(self):
+        """Fields with regex syntax, "=" or the separator are refused"""
+        for field in ("na.me", "e*mail", "(password)", "a=b", "a;b", ""):
+            with self.subTest(field=field):
+                with self.assertRaises(ValueError):
+                    SplitRedactor([field], "***", ";")
+
+    def test_invalid_separator(self):
+        """The separator must be one character"""
+        for separator in ("", ";;", "; "):
+            with self.subTest(separator=separator):
+                with self.assertRaises(ValueError):
+                    SplitRedactor(self.FIELDS, "***", separator)
+
+
+class TestAsynchronousLogging(unittest.TestCase):
+    """Tests of the asynchronous handler, listener and stop_logger"""
+
+    def setUp(self):
+        """Creates a logger writing to a string through a bounded queue"""
+        self.stream = io.StringIO()
+        self.logger = logging.Logger("test_user_data")
+
+    def add_handler(self, queue_size: int, policy: str,
+                    start: bool = True) -> BoundedQueueHandler:
+        """Returns the handler added to the logger, its listener started
+        unless start is False"""
+        stream_handler = BatchStreamHandler(self.stream)
+        stream_handler.setFormatter(
+            RedactingFormatter(filtered_logger.PII_FIELDS))
+        listener = BatchingQueueListener(queue.Queue(queue_size),
+                                         stream_handler, 10)
+        if start:
+            listener.start()
+        self.addCleanup(listener.stop)
+        handler = BoundedQueueHandler(listener, policy)
+        self.logger.addHandler(handler)
+        return handler
+
+    def messages(self) -> list:
+        """Returns the messages written to the stream"""
+        return [line.split(": ", 1)[1]
+                for line in self.stream.getvalue().splitlines()]
+
+    def test_drop_policy(self):
+        """Records logged to a full queue are dropped and reported by a
+        warning written before the next batch"""
+        handler = self.add_handler(2, "drop", start=False)
+        for i in range(5):
+            self.logger.info("name=user%d;ip=%d;", i, i)
+        self.assertEqual(handler.dropped, 3)
+        self.assertEqual(self.messages(), [])
+        handler.close()
+        self.assertEqual(self.messages(), [
+            "3 log records dropped: the queue was full",
+            "name=***;ip=0;", "name=***;ip=1;"])
+        self.assertIn("WARNING", self.stream.getvalue().splitlines()[0])
+
+    def test_warning_once(self):
+        """The dropped records are reported once"""
+        handler = self.add_handler(1, "drop", start=False)
+        self.logger.info("ip=0;")
+        self.logger.info("ip=1;")
+        handler.listener.write([])
+        handler.listener.write([])
+        self.assertEqual(self.messages(), [
+            "1 log records dropped: the queue was full"])
+
+    def test_block_policy_keeps_every_record(self):
+        """The block policy waits for the listener instead of dropping"""
+        handler = self.add_handler(3, "block")
+        for i in range(500):
+            self.logger.info("email=user%d@x;ip=%d;", i, i)
+        handler.close()
+        self.assertEqual(handler.dropped, 0)
+        self.assertEqual(self.messages(), [f"email=***;ip={i};"
+                                           for i in range(500)])
+
+    def test_stop_logger_drains_the_queue(self):
+        """stop_logger writes the queued records and removes the handler"""
+        logger = logging.getLogger("user_data")
+        self.addCleanup(setattr, logger, "handlers", list(logger.handlers))
+        logger.handlers.clear()
+        with patch.object(filtered_logger, "LOG_QUEUE_SIZE", 5000), \
+                patch.object(filtered_logger, "LOG_BATCH_SIZE", 7), \
+                redirect_stderr(self.stream):
+            logger = filtered_logger.get_logger(asynchronous=True)
+            for i in range(2000):
+                logger.info("ssn=%09d;ip=%d;", i, i)
+            filtered_logger.stop_logger(logger)
+        self.assertEqual(logger.handlers, [])
+        self.assertEqual(self.messages(), [f"ssn=***;ip={i};"
+                                           for i in range(2000)])
+
+    def check_synchronous_after_stop(self, start: bool) -> None:
+        """Checks that the records handled after the listener stopped are
+        written at once"""
+        handler = self.add_handler(10, "block", start)
+        self.logger.info("password=p;ip=0;")
+        handler.listener.stop()
+        self.assertEqual(self.messages(), ["password=***;ip=0;"])
+        self.logger.info("password=q;ip=1;")
+        self.assertEqual(self.messages(), ["password=***;ip=0;",
+                                           "password=***;ip=1;"])
+        self.assertTrue(handler.queue.empty())
+
+    def test_synchronous_after_stop(self):
+        """Records handled after the listener thread stopped are written
+        at once"""
+        self.check_synchronous_after_stop(True)
+
+    def test_synchronous_after_stop_unstarted(self):
+        """A listener stopped before being started drains the queue too"""
+        self.check_synchronous_after_stop(False)
+
+
+class TestPlaceholder(unittest.TestCase):
+    """Tests of placeholder"""
+
+    def test_sqlite3(self):
+        """sqlite3 uses the qmark paramstyle"""
+        with sqlite3.connect(":memory:") as db:
+            self.assertEqual(placeholder(db), "?")
+
+    def test_mysql_connector(self):
+        """mysql.connector uses the pyformat paramstyle"""
+        connection = filtered_logger.mysql.connector.connection
+        db = connection.MySQLConnection.__new__(connection.MySQLConnection)
+        self.assertEqual(placeholder(db), "%s")
+
+
+class TestIterUserBatches(unittest.TestCase):
+    """Tests of iter_user_batches"""
+
+    ROWS = 25
+
+    def setUp(self):
+        """Creates the users table"""
+        self.db = sqlite3.connect(":memory:")
+        create_users(self.db, self.ROWS)
+
+    def tearDown(self):
+        """Closes the database"""
+        self.db.close()
+
+    def read_ids(self, page_size: int, batch_size: int, **bounds) -> list:
+        """Returns the ids read, checking the size of each batch"""
+        ids = []
+        for fields, rows in iter_user_batches(self.db, "id", page_size,
+                                              batch_size, **bounds):
+            self.assertEqual(fields[0], "id")
+            self.assertTrue(0 < len(rows) <= batch_size)
+            ids.extend(row[0] for row in rows)
+        return ids
+
+    def test_page_and_batch_boundaries(self):
+        """Every row is read once, in key order"""
+        for page_size, batch_size in ((10, 3), (10, 10), (5, 5), (25, 7),
+                                      (24, 24), (1, 1), (100, 30)):
+            with self.subTest(page_size=page_size, batch_size=batch_size):
+                self.assertEqual(self.read_ids(page_size, batch_size),
+                                 list(range(1, self.ROWS + 1)))
+
+    def test_bounds(self):
+        """lower and upper are inclusive"""
+        self.assertEqual(self.read_ids(4, 3, lower=5, upper=17),
+                         list(range(5, 18)))
+        self.assertEqual(self.read_ids(4, 3, lower=20),
+                         list(range(20, self.ROWS + 1)))
+        self.assertEqual(self.read_ids(4, 3, upper=6), list(range(1, 7)))
+        self.assertEqual(self.read_ids(4, 3, lower=30), [])
+
+    def test_empty_table(self):
+        """An empty table yields no batch"""
+        self.db.execute("DELETE FROM users")
+        self.assertEqual(list(iter_user_batches(self.db, "id", 10, 3)), [])
+
+    def test_invalid_key(self):
+        """The key must be a column name"""
+        with self.assertRaises(ValueError):
+            list(iter_user_batches(self.db, "id; DROP TABLE users"))
+
+
+class TestMain(unittest.TestCase):
+    """Tests of the export modes of main"""
+
+    def setUp(self):
+        """Creates the users table in a database file"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db_path = os.path.join(directory.name, "users.db")
+        with sqlite3.connect(self.db_path) as db:
+            create_users(db, 2500)
+        logger = logging.getLogger("user_data")
+        self.addCleanup(setattr, logger, "handlers", list(logger.handlers))
+
+    def export(self, mode: str) -> list:
+        """Returns the messages logged by main in an export mode"""
+        stderr = io.StringIO()
+        with patch.object(filtered_logger, "EXPORT_MODE", mode), \
+                patch.object(filtered_logger, "get_db",
+                             lambda: sqlite3.connect(self.db_path)), \
+                redirect_stderr(stderr):
+            filtered_logger.main()
+        logging.getLogger("user_data").handlers.clear()
+        return [line.split(": ", 1)[1]
+                for line in stderr.getvalue().splitlines()]
+
+    def test_stream_matches_all(self):
+        """The stream mode logs the same lines as the default mode"""
+        with patch.object(filtered_logger, "EXPORT_PAGE_SIZE", 1000), \
+                patch.object(filtered_logger, "EXPORT_BATCH_SIZE", 300):
+            lines = self.export("all")
+            self.assertEqual(len(lines), 2500)
+            self.assertEqual(lines[0], "id=1; name=***; email=***; "
+                             "phone=***; ssn=***; password=***; "
+                             "ip=10.0.0.1;")
+            self.assertEqual(self.export("stream"), lines)
+
+
+@unittest.skipUnless(multiprocessing.get_start_method() == "fork",
+                     "the workers must inherit the patched get_db")
+class TestExportPartitions(unittest.TestCase):
+    """Tests of export_partitions"""
+
+    ROWS = 2500
+
+    def setUp(self):
+        """Creates the users table in a database file, and patches get_db
+        and the page and batch sizes"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.db_path = os.path.join(self.directory, "users.db")
+        with sqlite3.connect(self.db_path) as db:
+            create_users(db, self.ROWS)
+        for name, value in (("get_db", lambda: sqlite3.connect(self.db_path)),
+                            ("EXPORT_PAGE_SIZE", 1000),
+                            ("EXPORT_BATCH_SIZE", 300)):
+            patcher = patch.object(filtered_logger, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        logger = logging.getLogger("user_data")
+        self.addCleanup(setattr, logger, "handlers", list(logger.handlers))
+
+    @staticmethod
+    def messages(lines: list) -> list:
+        """Returns the messages of lines in the format of the logger"""
+        return [line.split(": ", 1)[1] for line in lines]
+
+    def export_all(self) -> list:
+        """Returns the messages logged by main in the default mode"""
+        stderr = io.StringIO()
+        with patch.object(filtered_logger, "EXPORT_MODE", "all"), \
+                redirect_stderr(stderr):
+            filtered_logger.main()
+        logging.getLogger("user_data").handlers.clear()
+        return self.messages(stderr.getvalue().splitlines())
+
+    def test_merged_matches_all(self):
+        """Without a directory, the ranges are written to stderr in key
+        order, as the default mode logs the rows"""
+        lines = self.export_all()
+        self.assertEqual(len(lines), self.ROWS)
+        for workers in (1, 3, 7):
+            with self.subTest(workers=workers):
+                stderr = io.StringIO()
+                with redirect_stderr(stderr):
+                    self.assertEqual(export_partitions(None, workers),
+                                     self.ROWS)
+                self.assertEqual(
+                    self.messages(stderr.getvalue().splitlines()), lines)
+
+    def test_directory(self):
+        """With a directory, each range is kept in a file of its own"""
+        lines = self.export_all()
+        directory = os.path.join(self.directory, "export")
+        os.mkdir(directory)
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            self.assertEqual(export_partitions(directory, 3), self.ROWS)
+        self.assertEqual(stderr.getvalue(), "")
+        names = sorted(os.listdir(directory))
+        self.assertEqual(names, ["users-0000.log", "users-0001.log",
+                                 "users-0002.log"])
+        exported = []
+        for name in names:
+            with open(os.path.join(directory, name)) as stream:
+                exported.extend(self.messages(stream.read().splitlines()))
+        self.assertEqual(exported, lines)
+
+    def test_empty_table(self):
+        """An empty table exports nothing"""
+        with sqlite3.connect(self.db_path) as db:
+            db.execute("DELETE FROM users")
+        directory = os.path.join(self.directory, "export")
+        os.mkdir(directory)
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            self.assertEqual(export_partitions(None, 2), 0)
+            self.assertEqual(export_partitions(directory, 2), 0)
+        self.assertEqual(stderr.getvalue(), "")
+        self.assertEqual(os.listdir(directory), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
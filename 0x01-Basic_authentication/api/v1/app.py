@@ -3,15 +3,19 @@
 Route module for the API
 """
 from os import getenv
+from api.v1 import instrumentation
 from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import CORS, cross_origin
+from models import storage
 import os
+import time
 
 
 app = Flask(__name__)
 app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
+storage.observer = instrumentation.persistence_duration.observe
 auth = None
 auth_type = os.getenv("AUTH_TYPE")
 
@@ -24,6 +28,17 @@ else:
 
     auth = Auth()
 
+# paths that don't require authentication ("*" wildcards allowed)
+EXCLUDED_PATHS = ["/api/v1/status/", "/api/v1/unauthorized/",
+                  "/api/v1/forbidden/"]
+# the metrics reveal authentication failures and timings: only public
+# when METRICS_PUBLIC is set
+if getenv("METRICS_PUBLIC", "0").lower() in ("1", "true", "yes"):
+    EXCLUDED_PATHS.append("/api/v1/metrics/")
+# a tuple is compared with the cached patterns without being copied
+EXCLUDED_PATHS = tuple(EXCLUDED_PATHS)
+auth.exclusion_matcher(EXCLUDED_PATHS)
+
 
 @app.before_request
 def before_request() -> None:
@@ -32,12 +47,12 @@ def before_request() -> None:
     Checks authentication status,
     authorization header, and current user.
     """
+    request.start_time = time.perf_counter()
+    instrumentation.requests.increment()
     if auth is None:
         return
 
-    excluded_paths = ["/api/v1/status/", "/api/v1/unauthorized/",
-                      "/api/v1/forbidden/"]
-    if not auth.require_auth(request.path, excluded_paths):
+    if not auth.require_auth(request.path, EXCLUDED_PATHS):
         return
 
     if auth.authorization_header(request) is None:
@@ -47,6 +62,20 @@ def before_request() -> None:
         abort(403)
 
 
+@app.after_request
+def after_request(response):
+    """Records the duration of the request and the authentication failures,
+    including the ones returned by the views"""
+    if response.status_code in (401, 403):
+        instrumentation.auth_failures.increment()
+    start_time = getattr(request, "start_time", None)
+    if start_time is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        instrumentation.request_duration.observe(
+            time.perf_counter() - start_time, request.method, route)
+    return response
+
+
 @app.errorhandler(404)
 def not_found(error) -> str:
     """Not found handler"""
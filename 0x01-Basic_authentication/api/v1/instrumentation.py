@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+""" Module of Instrumentation
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+import threading
+import time
+
+
+# every metric, in exposition order
+METRICS = []
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    """Formats label pairs as {name="value",...}"""
+    pairs = ['{}="{}"'.format(name, str(value).replace("\\", "\\\\")
+                              .replace('"', '\\"').replace("\n", "\\n"))
+             for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{{{}}}".format(",".join(pairs)) if pairs else ""
+
+
+class Counter:
+    """Monotonic counter shared by the request threads"""
+
+    def __init__(self, name: str, description: str = ""):
+        """Initializes the counter"""
+        self.name = name
+        self.description = description
+        self.value = 0
+        self._lock = threading.Lock()
+        METRICS.append(self)
+
+    def increment(self, amount: int = 1) -> None:
+        """Adds amount to the counter"""
+        with self._lock:
+            self.value += amount
+
+    def render(self) -> str:
+        """Returns the counter in the Prometheus text format"""
+        name = "{}_total".format(self.name)
+        return "# HELP {0} {1}\n# TYPE {0} counter\n{0} {2}\n".format(
+            name, self.description, self.value)
+
+
+class Histogram:
+    """
+    Distribution of durations in seconds, by label values.
+
+    An observation only increments one bucket and the sum under the lock:
+    the buckets are made cumulative when the histogram is rendered.
+    """
+
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+               0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, description: str = "",
+                 labels: tuple = ()):
+        """Initializes the histogram"""
+        self.name = name
+        self.description = description
+        self.labels = labels
+        # label values -> [count of each bucket, count above them, sum]
+        self.series = {}
+        self._lock = threading.Lock()
+        METRICS.append(self)
+
+    def observe(self, seconds: float, *label_values) -> None:
+        """Records one duration"""
+        index = bisect_left(self.BUCKETS, seconds)
+        with self._lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = [0] * (len(self.BUCKETS) + 1) + [0.0]
+                self.series[label_values] = series
+            series[index] += 1
+            series[-1] += seconds
+
+    @contextmanager
+    def timer(self, *label_values):
+        """Records the duration of the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self) -> str:
+        """Returns the histogram in the Prometheus text format"""
+        with self._lock:
+            snapshot = {label_values: list(series)
+                        for label_values, series in self.series.items()}
+        lines = ["# HELP {} {}".format(self.name, self.description),
+                 "# TYPE {} histogram".format(self.name)]
+        bounds = [repr(bound) for bound in self.BUCKETS] + ["+Inf"]
+        for label_values, series in sorted(snapshot.items()):
+            count = 0
+            for bound, bucket_count in zip(bounds, series):
+                count += bucket_count
+                lines.append("{}_bucket{} {}".format(
+                    self.name, _labels(self.labels, label_values,
+                                       'le="{}"'.format(bound)), count))
+            labels = _labels(self.labels, label_values)
+            lines.append("{}_sum{} {}".format(self.name, labels, series[-1]))
+            lines.append("{}_count{} {}".format(self.name, labels, count))
+        return "\n".join(lines) + "\n"
+
+
+def render_metrics() -> str:
+    """Returns every metric in the Prometheus text format"""
+    return "".join(metric.render() for metric in METRICS)
+
+
+requests = Counter("requests", "Requests handled by before_request")
+auth_failures = Counter(
+    "auth_failures", "Responses with a 401 or a 403, and logins of unknown "
+    "emails")
+request_duration = Histogram(
+    "request_duration_seconds", "Time to handle a request, by route",
+    ("method", "route"))
+auth_stage_duration = Histogram(
+    "auth_stage_duration_seconds",
+    "Time spent resolving the current user, by stage", ("stage",))
+persistence_duration = Histogram(
+    "persistence_duration_seconds",
+    "Time to write changes to the storage, by operation", ("operation",))
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+""" SQLite storage engine
+"""
+from os import getenv
+from typing import TypeVar, List
+import json
+import sqlite3
+import threading
+import time
+
+
+SQLITE_DB_PATH = getenv("SQLITE_DB_PATH", ".db.sqlite3")
+# creation day ("YYYY-MM-DD") of the object of a row
+CREATED_DAY = "substr(json_extract({}.data, '$.created_at'), 1, 10)"
+
+
+class SQLiteStorage():
+    """ Objects stored in a SQLite database shared between processes
+
+    Each class gets its own table: the object is stored as JSON in the
+    `data` column, and every attribute listed in `indexes` gets its own
+    indexed (and optionally unique) column. Triggers keep the number of
+    objects created each day in a `<class>_created` table.
+    """
+
+    def __init__(self, db_path: str = SQLITE_DB_PATH):
+        """ Initialize the storage
+        """
+        self._db_path = db_path
+        self._local = threading.local()
+        self._tables = set()
+        self._tables_lock = threading.Lock()
+        # called with (seconds, operation) after each committed change
+        self.observer = None
+
+    def _observe(self, operation: str, start: float):
+        """ Report the duration of a change started at `start`
+        """
+        if self.observer is not None:
+            self.observer(time.perf_counter() - start, operation)
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        """ Connection of the current thread
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self._db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _table(self, cls) -> str:
+        """ Create the table of a class if needed and return its name
+        """
+        s_class = cls.__name__
+        if s_class in self._tables:
+            return s_class
+        with self._tables_lock:
+            columns = "".join(', "{}" TEXT'.format(attr)
+                              for attr in cls.indexes)
+            conn = self._connection
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute('CREATE TABLE IF NOT EXISTS "{}" '
+                             '(id TEXT PRIMARY KEY, data TEXT NOT NULL{})'
+                             .format(s_class, columns))
+                existing = set(row[1] for row in conn.execute(
+                    'PRAGMA table_info("{}")'.format(s_class)))
+                for attr in cls.indexes:
+                    if attr in existing:
+                        continue
+                    # attribute indexed after the table was created
+                    conn.execute('ALTER TABLE "{}" ADD COLUMN "{}" TEXT'
+                                 .format(s_class, attr))
+                    conn.execute('UPDATE "{}" SET "{}" = '
+                                 'json_extract(data, ?)'
+                                 .format(s_class, attr), ("$." + attr,))
+                for attr, unique in cls.indexes.items():
+                    conn.execute('CREATE {}INDEX IF NOT EXISTS '
+                                 '"ix_{}_{}" ON "{}" ("{}")'
+                                 .format("UNIQUE " if unique else "",
+                                         s_class, attr, s_class, attr))
+                self._create_counters(conn, s_class)
+            self._tables.add(s_class)
+        return s_class
+
+    @staticmethod
+    def _create_counters(conn: sqlite3.Connection, s_class: str):
+        """ Create the table of the number of objects created each day,
+        and the triggers updating it
+        """
+        conn.execute('CREATE TABLE IF NOT EXISTS "{}_created" '
+                     '(day TEXT PRIMARY KEY, count INTEGER NOT NULL)'
+                     .format(s_class))
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' "
+                        "AND name = ?", (s_class + "_insert",)).fetchone():
+            return
+        # objects stored before the triggers existed
+        conn.execute('DELETE FROM "{}_created"'.format(s_class))
+        conn.execute('INSERT INTO "{0}_created" (day, count) '
+                     'SELECT {1} AS day, COUNT(*) FROM "{0}" AS obj '
+                     'GROUP BY day'
+                     .format(s_class, CREATED_DAY.format("obj")))
+        conn.execute('CREATE TRIGGER "{0}_insert" AFTER INSERT ON "{0}" '
+                     'BEGIN INSERT INTO "{0}_created" (day, count) '
+                     'VALUES ({1}, 1) ON CONFLICT(day) DO UPDATE '
+                     'SET count = count + 1; END'
+                     .format(s_class, CREATED_DAY.format("NEW")))
+        conn.execute('CREATE TRIGGER "{0}_delete" AFTER DELETE ON "{0}" '
+                     'BEGIN UPDATE "{0}_created" SET count = count - 1 '
+                     'WHERE day = {1}; '
+                     'DELETE FROM "{0}_created" WHERE day = {1} '
+                     'AND count = 0; END'
+                     .format(s_class, CREATED_DAY.format("OLD")))
+
+    def load(self, cls):
+        """ Nothing to load: objects are read from the database on demand
+        """
+        self._table(cls)
+
+    def save_to_file(self, cls):
+        """ Nothing to do: every change is committed by put()/delete()
+        """
+        self._table(cls)
+
+    def flush(self):
+        """ Nothing to do: every change is committed by put()/delete()
+        """
+        pass
+
+    def _upsert(self, cls) -> str:
+        """ Query inserting or updating one object of a class
+        """
+        table = self._table(cls)
+        attrs = list(cls.indexes)
+        columns = "".join(', "{}"'.format(attr) for attr in attrs)
+        updates = "".join(', "{0}" = excluded."{0}"'.format(attr)
+                          for attr in attrs)
+        placeholders = ", ?" * (len(attrs) + 2)
+        return ('INSERT INTO "{}" (id, data{}) VALUES ({}) '
+                'ON CONFLICT(id) DO UPDATE SET data = excluded.data{}'
+                .format(table, columns, placeholders[2:], updates))
+
+    @staticmethod
+    def _row(obj: TypeVar('Base')) -> list:
+        """ Values of the columns of an object
+
+        Raise a ValueError if an indexed attribute isn't a string
+        """
+        values = [obj.id, json.dumps(obj.to_json(True))]
+        for attr in obj.__class__.indexes:
+            value = getattr(obj, attr, None)
+            if value is not None and not isinstance(value, str):
+                raise ValueError("{} must be a string".format(attr))
+            values.append(value)
+        return values
+
+    def put(self, obj: TypeVar('Base')):
+        """ Store an object
+        """
+        self.put_many(obj.__class__, [obj])
+
+    def put_many(self, cls, objs: List[TypeVar('Base')]):
+        """ Store several objects of a class in one transaction
+
+        Nothing is stored if an unique attribute is already used.
+        """
+        query = self._upsert(cls)
+        start = time.perf_counter()
+        try:
+            with self._connection as conn:
+                conn.executemany(query, (self._row(obj) for obj in objs))
+        except sqlite3.IntegrityError:
+            raise ValueError("{} already exists".format(", ".join(
+                attr for attr, unique in cls.indexes.items() if unique)))
+        self._observe("put", start)
+
+    def delete(self, obj: TypeVar('Base')):
+        """ Remove an object
+        """
+        table = self._table(obj.__class__)
+        start = time.perf_counter()
+        with self._connection as conn:
+            conn.execute('DELETE FROM "{}" WHERE id = ?'.format(table),
+                         (obj.id,))
+        self._observe("delete", start)
+
+    def count(self, cls) -> int:
+        """ Count all objects of a class
+        """
+        table = self._table(cls)
+        row = self._connection.execute(
+            'SELECT COALESCE(SUM(count), 0) FROM "{}_created"'
+            .format(table)).fetchone()
+        return row[0]
+
+    def created_per_day(self, cls) -> dict:
+        """ Number of objects of a class created each day ("YYYY-MM-DD")
+        """
+        table = self._table(cls)
+        return dict(self._connection.execute(
+            'SELECT day, count FROM "{}_created" ORDER BY day'
+            .format(table)))
+
+    def get(self, cls, id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        table = self._table(cls)
+        row = self._connection.execute(
+            'SELECT data FROM "{}" WHERE id = ?'.format(table),
+            (id,)).fetchone()
+        if row is None:
+            return None
+        return cls(**json.loads(row[0]))
+
+    def page(self, cls, after: str = None,
+             limit: int = None) -> List[TypeVar('Base')]:
+        """ Return objects ordered by ID, starting after the ID `after`
+        """
+        table = self._table(cls)
+        rows = self._connection.execute(
+            'SELECT data FROM "{}" WHERE id > ? ORDER BY id LIMIT ?'
+            .format(table),
+            ("" if after is None else after, -1 if limit is None else limit))
+        return [cls(**json.loads(row[0])) for row in rows]
+
+    def search(self, cls, attributes: dict = {}) -> List[TypeVar('Base')]:
+        """ Search all objects with matching attributes
+
+        Indexed attributes are matched by SQLite, the others in Python.
+        """
+        table = self._table(cls)
+        clauses = []
+        values = []
+        for k, v in attributes.items():
+            if k in cls.indexes and (v is None or isinstance(v, str)):
+                clauses.append('"{}" IS ?'.format(k))
+                values.append(v)
+        query = 'SELECT data FROM "{}"'.format(table)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        rows = self._connection.execute(query + " ORDER BY rowid", values)
+
+        def _search(obj):
+            for k, v in attributes.items():
+                if (getattr(obj, k) != v):
+                    return False
+            return True
+
+        objs = (cls(**json.loads(row[0])) for row in rows)
+        return list(filter(_search, objs))
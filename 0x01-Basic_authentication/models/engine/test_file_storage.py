@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+""" Tests of the JSON file storage engine, each one in a temporary
+directory
+
+Usage (from the project directory):
+python3 -m unittest models.engine.test_file_storage
+"""
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import models.base
+from models.engine import file_storage
+from models.engine.file_storage import FileStorage, LazyObjects
+from models.user import User
+
+
+def new_user(email: str, first_name: str = None) -> User:
+    """ Return a new User, not stored
+    """
+    user = User()
+    user.email = email
+    user.password = "pwd"
+    user.first_name = first_name
+    return user
+
+
+class TestFileStorage(unittest.TestCase):
+    """ Tests of FileStorage
+    """
+
+    GLOBALS = ("DATA", "PENDING", "JOURNAL_SIZES", "INDEXES",
+               "INDEXED_VALUES", "SORTED_IDS", "CREATED_PER_DAY")
+
+    def setUp(self):
+        """ Use an empty storage in a temporary directory
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(directory.name)
+        self.clear()
+        self.addCleanup(self.clear)
+        # the flush registered for the exit is checked by test_batched
+        with patch("atexit.register"):
+            self.storage = FileStorage()
+        self.patch("storage", self.storage, models.base)
+        self.patch("PERSISTENCE_MODE", "snapshot")
+        self.patch("FLUSH_MODE", "sync")
+        self.patch("LAZY_LOAD", False)
+
+    def patch(self, name: str, value, module=file_storage):
+        """ Set an attribute of a module for the test
+        """
+        patcher = patch.object(module, name, value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def clear(self):
+        """ Forget every object, as a new process would
+        """
+        for name in self.GLOBALS:
+            getattr(file_storage, name).clear()
+
+    def reload(self):
+        """ Load the users from the files, as a new process would
+        """
+        self.clear()
+        self.storage.load(User)
+
+    def emails(self) -> list:
+        """ Emails of the stored users, sorted
+        """
+        return sorted(user.email for user in User.all())
+
+    def test_snapshot(self):
+        """ Every change rewrites the JSON file
+        """
+        user = new_user("a@x", "A")
+        user.save()
+        new_user("b@x").save()
+        with open(".db_User.json") as f:
+            self.assertEqual(sorted(json.load(f)), sorted(
+                u.id for u in User.all()))
+        user.remove()
+        self.reload()
+        self.assertEqual(self.emails(), ["b@x"])
+        self.assertFalse(os.path.exists(".db_User.log"))
+
+    def test_journal_replay_torn_line(self):
+        """ The journal is replayed up to a partially written record
+        """
+        self.patch("PERSISTENCE_MODE", "journal")
+        users = [new_user("{}@x".format(i)) for i in range(3)]
+        for user in users:
+            user.save()
+        users[0].first_name = "Zero"
+        users[0].save()
+        users[1].remove()
+        self.assertFalse(os.path.exists(".db_User.json"))
+        with open(".db_User.log", "a") as f:
+            f.write('{"op": "put", "id": "torn", "obj": {"id": "to')
+        self.reload()
+        self.assertEqual(self.emails(), ["0@x", "2@x"])
+        self.assertEqual(User.get(users[0].id).first_name, "Zero")
+        self.assertEqual(file_storage.JOURNAL_SIZES["User"], 5)
+        self.assertEqual(User.search({"first_name": "Zero"}), [users[0]])
+
+    def test_journal_compaction(self):
+        """ The journal is folded into the JSON file every
+        JOURNAL_COMPACT_SIZE records
+        """
+        self.patch("PERSISTENCE_MODE", "journal")
+        self.patch("JOURNAL_COMPACT_SIZE", 3)
+        for i in range(3):
+            new_user("{}@x".format(i)).save()
+        self.assertFalse(os.path.exists(".db_User.log"))
+        with open(".db_User.json") as f:
+            self.assertEqual(len(json.load(f)), 3)
+        new_user("3@x").save()
+        with open(".db_User.log") as f:
+            self.assertEqual(len(f.readlines()), 1)
+        self.reload()
+        self.assertEqual(self.emails(), ["0@x", "1@x", "2@x", "3@x"])
+
+    def test_batched(self):
+        """ Batched changes are written by the flush registered for the
+        exit
+        """
+        with patch("atexit.register") as register:
+            storage = FileStorage()
+        register.assert_called_once_with(storage.flush)
+        for mode in ("snapshot", "journal"):
+            with self.subTest(mode=mode):
+                self.reload()
+                self.patch("PERSISTENCE_MODE", mode)
+                self.patch("FLUSH_MODE", "batched")
+                # only the exit flushes
+                self.patch("FLUSH_INTERVAL", 3600)
+                self.patch("FLUSH_MAX_PENDING", 1000)
+                user = new_user("{}@x".format(mode))
+                user.save()
+                user.first_name = mode
+                user.save()
+                self.assertEqual(len(file_storage.PENDING["User"][1]), 2)
+                storage.flush()
+                self.assertEqual(file_storage.PENDING, {})
+                self.reload()
+                self.assertEqual(User.get(user.id).first_name, mode)
+
+    def test_lazy_load(self):
+        """ With LAZY_LOAD, the JSON-lines file is read on demand
+        """
+        self.patch("LAZY_LOAD", True)
+        user = new_user("a@x", "A")
+        user.save()
+        new_user("b@x").save()
+        self.reload()
+        objs = file_storage.DATA["User"]
+        self.assertIsInstance(objs, LazyObjects)
+        self.assertEqual(User.count(), 2)
+        self.assertFalse(objs.is_loaded(user.id))
+        self.assertEqual(User.search({"first_name": "A"}), [user])
+        self.assertEqual(User.get(user.id).email, "a@x")
+        self.assertTrue(objs.is_loaded(user.id))
+
+    def test_stale_sidecar(self):
+        """ A JSON-lines file older than the JSON file isn't read, and a
+        snapshot without LAZY_LOAD removes it
+        """
+        self.patch("LAZY_LOAD", True)
+        user = new_user("a@x", "Old")
+        user.save()
+        with open(".db_User.jsonl") as f:
+            stale = f.read()
+        self.patch("LAZY_LOAD", False)
+        user.first_name = "New"
+        user.save()
+        self.assertFalse(os.path.exists(".db_User.jsonl"))
+
+        # a stale file left by a crash
+        with open(".db_User.jsonl", "w") as f:
+            f.write(stale)
+        mtime = os.stat(".db_User.json").st_mtime_ns - 10 ** 9
+        os.utime(".db_User.jsonl", ns=(mtime, mtime))
+        self.patch("LAZY_LOAD", True)
+        self.reload()
+        self.assertNotIsInstance(file_storage.DATA["User"], LazyObjects)
+        self.assertEqual(User.get(user.id).first_name, "New")
+        # rewritten for the next start
+        self.reload()
+        self.assertIsInstance(file_storage.DATA["User"], LazyObjects)
+        self.assertEqual(User.get(user.id).first_name, "New")
+
+    def test_put_many_unique(self):
+        """ Nothing is stored if an email is already used, by a stored
+        user or inside the batch
+        """
+        self.patch("PERSISTENCE_MODE", "journal")
+        new_user("a@x").save()
+        for emails in (["b@x", "a@x"], ["c@x", "c@x"]):
+            with self.subTest(emails=emails):
+                with self.assertRaises(ValueError):
+                    User.save_many([new_user(email) for email in emails])
+                self.assertEqual(self.emails(), ["a@x"])
+        User.save_many([new_user("b@x"), new_user("c@x")])
+        self.reload()
+        self.assertEqual(self.emails(), ["a@x", "b@x", "c@x"])
+
+    def test_rejected_put_restores_indexed_values(self):
+        """ A stored user changed in place keeps its indexed values when
+        the change is rejected
+        """
+        user = new_user("a@x", "A")
+        user.save()
+        new_user("b@x").save()
+        for attr, value in (("email", "b@x"), ("first_name", 1)):
+            with self.subTest(attr=attr):
+                setattr(user, attr, value)
+                with self.assertRaises(ValueError):
+                    user.save()
+                self.assertEqual((user.email, user.first_name), ("a@x", "A"))
+        self.assertEqual(User.search({"email": "a@x"}), [user])
+        self.assertEqual(User.search({"first_name": "A"}), [user])
+        self.reload()
+        self.assertEqual(User.get(user.id).first_name, "A")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,15 +3,19 @@
 Route module for the API
 """
 from os import getenv
+from api.v1 import instrumentation
 from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import CORS, cross_origin
+from models import storage
 import os
+import time
 
 
 app = Flask(__name__)
 app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
+storage.observer = instrumentation.persistence_duration.observe
 auth = None
 auth_type = os.getenv("AUTH_TYPE")
 
@@ -23,11 +27,34 @@ elif auth_type == "session_auth":
     from api.v1.auth.session_auth import SessionAuth
 
     auth = SessionAuth()
+elif auth_type == "session_exp_auth":
+    from api.v1.auth.session_exp_auth import SessionExpAuth
+
+    auth = SessionExpAuth()
+elif auth_type == "signed_session_auth":
+    from api.v1.auth.signed_session_auth import SignedSessionAuth
+
+    auth = SignedSessionAuth()
 else:
     from api.v1.auth.auth import Auth
 
     auth = Auth()
 
+# paths that don't require authentication ("*" wildcards allowed)
+EXCLUDED_PATHS = [
+    "/api/v1/status/",
+    "/api/v1/unauthorized/",
+    "/api/v1/forbidden/",
+    "/api/v1/auth_session/login/",
+]
+# the metrics reveal authentication failures and timings: only public
+# when METRICS_PUBLIC is set
+if getenv("METRICS_PUBLIC", "0").lower() in ("1", "true", "yes"):
+    EXCLUDED_PATHS.append("/api/v1/metrics/")
+# a tuple is compared with the cached patterns without being copied
+EXCLUDED_PATHS = tuple(EXCLUDED_PATHS)
+auth.exclusion_matcher(EXCLUDED_PATHS)
+
 
 @app.before_request
 def before_request() -> None:
@@ -36,16 +63,12 @@ def before_request() -> None:
     Checks authentication status,
     authorization header, and current user.
     """
+    request.start_time = time.perf_counter()
+    instrumentation.requests.increment()
     if auth is None:
         return
 
-    excluded_paths = [
-        "/api/v1/status/",
-        "/api/v1/unauthorized/",
-        "/api/v1/forbidden/",
-        "/api/v1/auth_session/login/",
-    ]
-    if not auth.require_auth(request.path, excluded_paths):
+    if not auth.require_auth(request.path, EXCLUDED_PATHS):
         return
 
     if (
@@ -54,12 +77,22 @@ def before_request() -> None:
     ):
         abort(401)
 
-    if auth.current_user(request) is None:
+    if auth.resolve_current_user(request) is None:
         abort(403)
 
-    request.current_user = auth.current_user(request)
-    if request.current_user is None:
-        abort(403)
+
+@app.after_request
+def after_request(response):
+    """Records the duration of the request and the authentication failures,
+    including the ones of the views (e.g. a login with a wrong password)"""
+    if response.status_code in (401, 403):
+        instrumentation.auth_failures.increment()
+    start_time = getattr(request, "start_time", None)
+    if start_time is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        instrumentation.request_duration.observe(
+            time.perf_counter() - start_time, request.method, route)
+    return response
 
 
 @app.errorhandler(404)
@@ -1,28 +1,93 @@
 #!/usr/bin/env python3
 """ Module of Authentication
 """
+from api.v1 import instrumentation
+import fnmatch
 from flask import request
+import re
 from typing import List, TypeVar
 import os
 
 
+class PathMatcher:
+    """
+    Matches paths against a list of patterns, ignoring trailing slashes.
+
+    Patterns ending with "*" match every path starting with the rest of the
+    pattern and are stored in a prefix trie; other patterns are stored in a
+    set. Patterns with a "*" elsewhere are compiled in a regular expression.
+    A lookup costs O(len(path)) whatever the number of patterns.
+    """
+
+    _END = None
+
+    def __init__(self, patterns: List[str]):
+        """Compiles the patterns"""
+        self._exact = set()
+        self._trie = {}
+        wildcards = []
+        for pattern in patterns:
+            if not pattern:
+                continue
+            if pattern[-1] == "*" and "*" not in pattern[:-1]:
+                node = self._trie
+                for char in pattern[:-1]:
+                    node = node.setdefault(char, {})
+                node[self._END] = True
+            elif "*" in pattern:
+                wildcards.append(fnmatch.translate(pattern.rstrip("/")))
+            else:
+                self._exact.add(pattern.rstrip("/") + "/")
+        self._regex = None
+        if wildcards:
+            self._regex = re.compile("|".join(wildcards))
+
+    def match(self, path: str) -> bool:
+        """Tells if path matches one of the patterns"""
+        if path[-1:] != "/":
+            path += "/"
+        if path in self._exact:
+            return True
+
+        node = self._trie
+        for char in path:
+            if self._END in node:
+                return True
+            node = node.get(char)
+            if node is None:
+                break
+        else:
+            if self._END in node:
+                return True
+
+        if self._regex is not None:
+            return self._regex.match(path.rstrip("/")) is not None
+        return False
+
+
 class Auth:
     """Auth class"""
 
+    def exclusion_matcher(self, excluded_paths: List[str]) -> PathMatcher:
+        """
+        Returns the PathMatcher of excluded_paths, compiled once: the
+        matcher is rebuilt only when the patterns change, even in place.
+        A tuple is compared without being copied.
+        """
+        patterns = tuple(excluded_paths)
+        cached = getattr(self, "_exclusion_matcher", None)
+        if cached is None or cached[0] != patterns:
+            cached = (patterns, PathMatcher(patterns))
+            self._exclusion_matcher = cached
+        return cached[1]
+
     def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
         """require_auth"""
         if path is None:
             return True
-        if excluded_paths is None or excluded_paths == []:
+        if excluded_paths is None or len(excluded_paths) == 0:
             return True
-        if path[-1] != "/":
-            path += "/"
-        for ex_path in excluded_paths:
-            if ex_path[-1] != "/":
-                ex_path += "/"
-            if path == ex_path:
-                return False
-        return True
+        return not self.exclusion_matcher(excluded_paths).match(path)
 
     def authorization_header(self, request=None) -> str:
         """authorization_header"""
@@ -36,6 +101,21 @@ class Auth:
         """current_user"""
         return None
 
+    def resolve_current_user(self, request=None) -> TypeVar("User"):
+        """
+        Resolves the current user once per request and stores it in
+        request.current_user, so views can reuse it.
+        """
+        if request is None:
+            return None
+        if getattr(request, "current_user_resolved", False):
+            return request.current_user
+
+        instrumentation.current_user_resolutions.increment()
+        request.current_user = self.current_user(request)
+        request.current_user_resolved = True
+        return request.current_user
+
     def session_cookie(self, request=None) -> str:
         """Returns the session ID from a cookie"""
         if request is None:
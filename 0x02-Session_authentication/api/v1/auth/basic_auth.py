@@ -1,8 +1,15 @@
 #!/usr/bin/env python3
 """ Module of Basic Authentication
 """
+from api.v1 import instrumentation
 from api.v1.auth.auth import Auth
 import base64
+from collections import OrderedDict
+import hashlib
+import hmac
+import os
+import threading
+import time
 from typing import Tuple, TypeVar
 from models.user import User
 
@@ -10,6 +17,16 @@ from models.user import User
 class BasicAuth(Auth):
     """Basic Auth class"""
 
+    # Verified Authorization headers:
+    # keyed hash of the header ->
+    # (user ID, email, password hash, expiration time)
+    cache_size = int(os.getenv("BASIC_AUTH_CACHE_SIZE", "1024"))
+    cache_ttl = float(os.getenv("BASIC_AUTH_CACHE_TTL", "300"))
+    _cache = OrderedDict()
+    _cache_lock = threading.Lock()
+    # the headers contain clear passwords: never use them as keys
+    _cache_key = os.urandom(32)
+
     def extract_base64_authorization_header(self,
                                             authorization_header: str) -> str:
         """
@@ -95,17 +112,20 @@ class BasicAuth(Auth):
         if user_pwd is None or not isinstance(user_pwd, str):
             return None
 
+        stage_timer = instrumentation.auth_stage_duration.timer
         try:
-            users = User.search({"email": user_email})
+            with stage_timer("user_search"):
+                users = User.search({"email": user_email})
         except Exception:
             return None
 
         if not users:
             return None
 
-        for user in users:
-            if user.is_valid_password(user_pwd):
-                return user
+        with stage_timer("password_check"):
+            for user in users:
+                if user.is_valid_password(user_pwd):
+                    return user
 
         return None
 
@@ -124,15 +144,24 @@ class BasicAuth(Auth):
         if request is None:
             return None
 
-        auth_header = self.authorization_header(request)
+        stage_timer = instrumentation.auth_stage_duration.timer
+        with stage_timer("authorization_header"):
+            auth_header = self.authorization_header(request)
         if auth_header is None:
             return None
 
-        base64_auth = self.extract_base64_authorization_header(auth_header)
-        if base64_auth is None:
-            return None
-
-        decoded_auth = self.decode_base64_authorization_header(base64_auth)
+        with stage_timer("cache_lookup"):
+            user = self.cached_user(auth_header)
+        if user is not None:
+            return user
+
+        with stage_timer("base64_decode"):
+            base64_auth = self.extract_base64_authorization_header(
+                auth_header)
+            decoded_auth = None
+            if base64_auth is not None:
+                decoded_auth = self.decode_base64_authorization_header(
+                    base64_auth)
         if decoded_auth is None:
             return None
 
@@ -141,4 +170,70 @@ class BasicAuth(Auth):
             return None
 
         user_email, user_pwd = user_credentials
-        return self.user_object_from_credentials(user_email, user_pwd)
+        user = self.user_object_from_credentials(user_email, user_pwd)
+        if user is not None:
+            self.cache_user(auth_header, user)
+        return user
+
+    def _header_key(self, authorization_header: str) -> bytes:
+        """
+        Returns the cache key of an Authorization header.
+        """
+        return hmac.new(self._cache_key, authorization_header.encode(),
+                        hashlib.sha256).digest()
+
+    def cached_user(self, authorization_header: str) -> TypeVar("User"):
+        """
+        Retrieves the user of an already verified Authorization header.
+
+        Args:
+            authorization_header (str): The Authorization header.
+
+        Returns:
+            TypeVar("User"): The user object if the header is cached,
+            not expired and the user still exists with the same email
+            and password, otherwise None.
+        """
+        if self.cache_size <= 0:
+            return None
+
+        key = self._header_key(authorization_header)
+        with self._cache_lock:
+            entry = self._cache.get(key)
+        if entry is None:
+            return None
+
+        user_id, email, password, expires_at = entry
+        user = None
+        if expires_at > time.monotonic():
+            user = User.get(user_id)
+        if user is None or user.email != email or \
+                user.password != password:
+            with self._cache_lock:
+                self._cache.pop(key, None)
+            return None
+
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+        return user
+
+    def cache_user(self, authorization_header: str, user: TypeVar("User")):
+        """
+        Caches the user of a verified Authorization header.
+
+        Args:
+            authorization_header (str): The Authorization header.
+            user (TypeVar("User")): The user matching the header.
+        """
+        if self.cache_size <= 0:
+            return
+
+        key = self._header_key(authorization_header)
+        entry = (user.id, user.email, user.password,
+                 time.monotonic() + self.cache_ttl)
+        with self._cache_lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 """Module of session auth"""
 
+from api.v1 import instrumentation
 from api.v1.auth.auth import Auth
+from api.v1.auth.session_store import SessionStore, get_session_store
+from collections import OrderedDict
 import uuid
 import os
 from typing import TypeVar
@@ -11,7 +14,25 @@ from models.user import User
 class SessionAuth(Auth):
     """Session Auth class"""
 
-    user_id_by_session_id = {}
+    # sessions of the in-memory store: session ID -> user ID
+    user_id_by_session_id = OrderedDict()
+    _store = None
+
+    def __init__(self):
+        """Creates the session store of the class, loading persisted
+        sessions, unless another instance already did"""
+        cls = type(self)
+        if cls.__dict__.get("_store") is None:
+            cls._store = self.create_store()
+
+    @property
+    def store(self) -> SessionStore:
+        """The session store, shared by the instances of the class"""
+        return type(self)._store
+
+    def create_store(self) -> SessionStore:
+        """Creates the session store selected by SESSION_STORE"""
+        return get_session_store(self.user_id_by_session_id, user_ids=True)
 
     def create_session(self, user_id: str = None) -> str:
         """
@@ -31,7 +52,7 @@ class SessionAuth(Auth):
             return None
         else:
             session_id = str(uuid.uuid4())
-            self.user_id_by_session_id[session_id] = user_id
+            self.store.save(session_id, user_id)
             return session_id
 
     def user_id_for_session_id(self, session_id: str = None) -> str:
@@ -50,23 +71,66 @@ class SessionAuth(Auth):
             return None
         elif type(session_id) is not str:
             return None
-        else:
-            return self.user_id_by_session_id.get(session_id)
+        session = self.store.get(session_id)
+        if session is None:
+            return None
+        return session.get("user_id")
+
+    def count_sessions(self, user_id: str = None) -> int:
+        """
+        Returns the number of sessions of a user.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            int: The number of sessions of the user.
+        """
+        if user_id is None or type(user_id) is not str:
+            return 0
+        return self.store.count_user_sessions(user_id)
+
+    def count_active_sessions(self) -> int:
+        """
+        Returns the number of sessions of all users.
+
+        Returns:
+            int: The number of sessions which haven't expired.
+        """
+        return self.store.count()
+
+    def destroy_all_sessions(self, user_id: str = None) -> int:
+        """
+        Deletes all sessions of a user / logout everywhere.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            int: The number of deleted sessions.
+        """
+        if user_id is None or type(user_id) is not str:
+            return 0
+        return self.store.delete_user_sessions(user_id)
 
     def current_user(self, request=None) -> TypeVar("User"):  # type: ignore
         """Returns a User instance based on a cookie value"""
         if request is None:
             return None
 
-        session_id = self.session_cookie(request)
+        stage_timer = instrumentation.auth_stage_duration.timer
+        with stage_timer("session_cookie"):
+            session_id = self.session_cookie(request)
         if session_id is None:
             return None
 
-        user_id = self.user_id_for_session_id(session_id)
+        with stage_timer("session_lookup"):
+            user_id = self.user_id_for_session_id(session_id)
         if user_id is None:
             return None
 
-        return User.get(user_id)
+        with stage_timer("user_get"):
+            return User.get(user_id)
 
     def destroy_session(self, request=None):
         """Deletes the user session / logout"""
@@ -81,5 +145,5 @@ class SessionAuth(Auth):
         if user_id is None:
             return False
 
-        del self.user_id_by_session_id[session_id]
+        self.store.delete(session_id)
         return True
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""Module of session auth with expiration"""
+
+from api.v1.auth.session_auth import SessionAuth
+from api.v1.auth.session_store import SessionStore, get_session_store
+import os
+
+
+class SessionExpAuth(SessionAuth):
+    """
+    Session Auth class with expiration and a maximum number of sessions.
+
+    Sessions expire SESSION_DURATION seconds after their creation and at
+    most SESSION_MAX_COUNT sessions are kept: the session store evicts
+    them (see api.v1.auth.session_store).
+    """
+
+    def __init__(self):
+        """Initializes the session duration and the session limit"""
+        try:
+            self.session_duration = int(os.getenv("SESSION_DURATION", "0"))
+        except ValueError:
+            self.session_duration = 0
+        try:
+            self.max_sessions = int(os.getenv("SESSION_MAX_COUNT", "0"))
+        except ValueError:
+            self.max_sessions = 0
+        super().__init__()
+
+    def create_store(self) -> SessionStore:
+        """Creates the session store selected by SESSION_STORE"""
+        return get_session_store(self.user_id_by_session_id,
+                                 self.session_duration, self.max_sessions)
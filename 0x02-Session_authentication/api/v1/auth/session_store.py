@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""Module of session stores"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SessionStore(ABC):
+    """
+    Interface of the session stores.
+
+    A session is a dictionary with the "user_id" and "created_at" keys.
+    When duration is positive, sessions expire duration seconds after
+    their creation; when max_sessions is positive, creating a session
+    evicts the oldest ones beyond that number.
+    """
+
+    def __init__(self, duration: int = 0, max_sessions: int = 0):
+        """Initializes the expiration settings"""
+        self.duration = duration
+        self.max_sessions = max_sessions
+
+    def is_expired(self, session: dict) -> bool:
+        """Tells if a session has expired"""
+        if self.duration <= 0:
+            return False
+        created_at = session.get("created_at")
+        if created_at is None:
+            return True
+        return created_at + timedelta(seconds=self.duration) < datetime.now()
+
+    @abstractmethod
+    def save(self, session_id: str, user_id: str) -> None:
+        """Stores a new session"""
+
+    @abstractmethod
+    def get(self, session_id: str) -> dict:
+        """Returns a session, or None if it doesn't exist or has expired"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """Deletes a session, returns False if it doesn't exist"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Returns the number of sessions"""
+
+    @abstractmethod
+    def count_user_sessions(self, user_id: str) -> int:
+        """Returns the number of sessions of a user"""
+
+    @abstractmethod
+    def delete_user_sessions(self, user_id: str) -> int:
+        """Deletes all sessions of a user, returns how many were deleted"""
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions kept in a dictionary of the process.
+
+    Every session lives the same duration, so sessions expire in creation
+    order: expirations are queued in a FIFO and expired sessions are
+    evicted from its head, in amortized O(1) and without scanning the
+    sessions. The session limit evicts the least recently used sessions.
+    A reverse index (user ID -> session IDs) gives the sessions of a user
+    without scanning the sessions.
+
+    With user_ids, sessions maps session IDs to user IDs, as
+    SessionAuth.user_id_by_session_id does, instead of session
+    dictionaries: their sessions have no creation time.
+    """
+
+    def __init__(self, sessions: OrderedDict = None, duration: int = 0,
+                 max_sessions: int = 0, user_ids: bool = False):
+        """Initializes the store around sessions"""
+        super().__init__(duration, max_sessions)
+        # session ID -> session dictionary (user ID with user_ids),
+        # least recently used first
+        self.sessions = sessions if sessions is not None else OrderedDict()
+        self.user_ids = user_ids
+        # user ID -> {session ID: None}
+        self.session_ids_by_user_id = {}
+        for session_id, stored in self.sessions.items():
+            self._index(session_id, self._session(stored))
+        # (expiration time, session ID), in expiration order, including
+        # sessions deleted since: compacted by _insert
+        self._expirations = deque()
+        self._lock = threading.Lock()
+
+    def _session(self, stored) -> dict:
+        """Returns the session dictionary of a value of sessions"""
+        if self.user_ids:
+            return {"user_id": stored, "created_at": None}
+        return stored
+
+    def _stored(self, session: dict):
+        """Returns the value of sessions of a session dictionary"""
+        return session["user_id"] if self.user_ids else session
+
+    def _index(self, session_id: str, session: dict) -> None:
+        """Adds a session to the reverse index"""
+        session_ids = self.session_ids_by_user_id.setdefault(
+            session["user_id"], {})
+        session_ids[session_id] = None
+
+    def _discard(self, session_id: str) -> dict:
+        """Removes a session and its reverse index entry"""
+        stored = self.sessions.pop(session_id, None)
+        if stored is None:
+            return None
+        session = self._session(stored)
+        session_ids = self.session_ids_by_user_id.get(session["user_id"])
+        if session_ids is not None:
+            session_ids.pop(session_id, None)
+            if len(session_ids) == 0:
+                del self.session_ids_by_user_id[session["user_id"]]
+        return session
+
+    def _evict_expired(self) -> None:
+        """Deletes the sessions expired at the head of the queue"""
+        now = time.monotonic()
+        while self._expirations and self._expirations[0][0] <= now:
+            _, session_id = self._expirations.popleft()
+            self._discard(session_id)
+
+    def _insert(self, session_id: str, session: dict) -> list:
+        """
+        Adds a session, sessions must be added in creation order.
+
+        Returns:
+            list: The IDs of the sessions evicted by the session limit.
+        """
+        self.sessions[session_id] = self._stored(session)
+        self._index(session_id, session)
+        if self.duration > 0:
+            age = (datetime.now() - session["created_at"]).total_seconds()
+            self._expirations.append(
+                (time.monotonic() + self.duration - age, session_id))
+        self._evict_expired()
+        evicted = []
+        while 0 < self.max_sessions < len(self.sessions):
+            evicted.append(next(iter(self.sessions)))
+            self._discard(evicted[-1])
+        if len(self._expirations) > 2 * len(self.sessions):
+            # forget the sessions deleted or evicted before expiring
+            self._expirations = deque(
+                expiration for expiration in self._expirations
+                if expiration[1] in self.sessions)
+        return evicted
+
+    def save(self, session_id: str, user_id: str) -> None:
+        """Stores a new session"""
+        with self._lock:
+            self._insert(session_id, {
+                "user_id": user_id,
+                "created_at": datetime.now(),
+            })
+
+    def get(self, session_id: str) -> dict:
+        """Returns a session, or None if it doesn't exist or has expired"""
+        with self._lock:
+            self._evict_expired()
+            stored = self.sessions.get(session_id)
+            if stored is None:
+                return None
+            session = self._session(stored)
+            if self.is_expired(session):
+                self._discard(session_id)
+                return None
+            self.sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        """Deletes a session, returns False if it doesn't exist"""
+        with self._lock:
+            return self._discard(session_id) is not None
+
+    def count(self) -> int:
+        """Returns the number of sessions"""
+        with self._lock:
+            self._evict_expired()
+            return len(self.sessions)
+
+    def count_user_sessions(self, user_id: str) -> int:
+        """Returns the number of sessions of a user"""
+        with self._lock:
+            self._evict_expired()
+            return len(self.session_ids_by_user_id.get(user_id, {}))
+
+    def delete_user_sessions(self, user_id: str) -> int:
+        """Deletes all sessions of a user, returns how many were deleted"""
+        with self._lock:
+            session_ids = list(self.session_ids_by_user_id.get(user_id, {}))
+            for session_id in session_ids:
+                self._discard(session_id)
+        return len(session_ids)
+
+
+class FileSessionStore(MemorySessionStore):
+    """
+    Sessions kept in memory and persisted in an append-only file, so they
+    survive restarts.
+
+    Every creation and deletion, including the evictions of the session
+    limit, appends one JSON line to the file, which is read back in a
+    single streamed pass when the store is created.
+    The file is compacted to the live sessions when it holds more than
+    twice as many records (and at least COMPACT_MIN_RECORDS).
+    """
+
+    TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+    COMPACT_MIN_RECORDS = 1000
+
+    def __init__(self, file_path: str, sessions: OrderedDict = None,
+                 duration: int = 0, max_sessions: int = 0,
+                 user_ids: bool = False):
+        """Initializes the store and loads the sessions of the file"""
+        super().__init__(sessions, duration, max_sessions, user_ids)
+        self._file_path = file_path
+        self._file_lock = threading.Lock()
+        self._records = 0
+        self.load_from_file()
+
+    def load_from_file(self) -> None:
+        """Loads all sessions from the file"""
+        loaded = OrderedDict()
+        records = 0
+        if os.path.exists(self._file_path):
+            with open(self._file_path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # partially written record (crash during append)
+                        continue
+                    records += 1
+                    if record.get("op") == "put":
+                        created_at = record.get("created_at")
+                        if created_at is not None:
+                            created_at = datetime.strptime(
+                                created_at, self.TIMESTAMP_FORMAT)
+                        loaded[record["id"]] = {
+                            "user_id": record["user_id"],
+                            "created_at": created_at,
+                        }
+                    elif record.get("op") == "del":
+                        loaded.pop(record["id"], None)
+
+        with self._lock:
+            self.sessions.clear()
+            self.session_ids_by_user_id.clear()
+            self._expirations.clear()
+            for session_id, session in loaded.items():
+                if not self.is_expired(session):
+                    self._insert(session_id, session)
+        self._records = records
+
+    def save_to_file(self) -> None:
+        """Rewrites the file with the live sessions only"""
+        with self._file_lock:
+            with self._lock:
+                records = [self._record("put", session_id,
+                                        self._session(stored))
+                           for session_id, stored in self.sessions.items()]
+            tmp_path = "{}.tmp".format(self._file_path)
+            with open(tmp_path, "w") as f:
+                f.write("".join(records))
+            os.replace(tmp_path, self._file_path)
+            self._records = len(records)
+
+    def _record(self, op: str, session_id: str, session: dict = None) -> str:
+        """Returns the JSON line of a creation or a deletion"""
+        record = {"op": op, "id": session_id}
+        if session is not None:
+            record["user_id"] = session["user_id"]
+            if session["created_at"] is not None:
+                record["created_at"] = session["created_at"].strftime(
+                    self.TIMESTAMP_FORMAT)
+        return json.dumps(record) + "\n"
+
+    def _append(self, line: str) -> None:
+        """Appends records to the file, compacting it if needed"""
+        with self._file_lock:
+            with open(self._file_path, "a") as f:
+                f.write(line)
+            self._records += line.count("\n")
+            compact = self._records >= self.COMPACT_MIN_RECORDS and \
+                self._records > 2 * len(self.sessions)
+        if compact:
+            self.save_to_file()
+
+    def save(self, session_id: str, user_id: str) -> None:
+        """Stores a new session"""
+        session = {"user_id": user_id, "created_at": datetime.now()}
+        with self._lock:
+            evicted = self._insert(session_id, session)
+        # replaying the file restores the sessions in creation order:
+        # the evictions of the least recently used ones are recorded
+        self._append(self._record("put", session_id, session) +
+                     "".join(self._record("del", evicted_id)
+                             for evicted_id in evicted))
+
+    def delete(self, session_id: str) -> bool:
+        """Deletes a session, returns False if it doesn't exist"""
+        if not super().delete(session_id):
+            return False
+        self._append(self._record("del", session_id))
+        return True
+
+    def delete_user_sessions(self, user_id: str) -> int:
+        """Deletes all sessions of a user, returns how many were deleted"""
+        with self._lock:
+            session_ids = list(self.session_ids_by_user_id.get(user_id, {}))
+            for session_id in session_ids:
+                self._discard(session_id)
+        if session_ids:
+            self._append("".join(self._record("del", session_id)
+                                 for session_id in session_ids))
+        return len(session_ids)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions stored in a SQLite database in WAL mode, shared by every
+    process using the same file (e.g. gunicorn workers).
+
+    Expired sessions are purged at most once per PURGE_INTERVAL seconds
+    using the created_at index. The session limit evicts the oldest
+    created sessions rather than the least recently used ones, so reading
+    a session never writes. Triggers keep the number of sessions in the
+    sessions_count table, so counting them doesn't scan the sessions.
+    """
+
+    PURGE_INTERVAL = 60
+
+    def __init__(self, db_path: str, duration: int = 0,
+                 max_sessions: int = 0):
+        """Initializes the store and creates the sessions table"""
+        super().__init__(duration, max_sessions)
+        self._db_path = db_path
+        self._local = threading.local()
+        self._last_purge = 0
+        with self._connection as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions "
+                         "(session_id TEXT PRIMARY KEY, "
+                         "user_id TEXT NOT NULL, "
+                         "created_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_created_at "
+                         "ON sessions (created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_user_id "
+                         "ON sessions (user_id)")
+            self._create_counter(conn)
+
+    @staticmethod
+    def _create_counter(conn: sqlite3.Connection) -> None:
+        """Creates the table of the number of sessions, and the triggers
+        updating it"""
+        conn.execute("CREATE TABLE IF NOT EXISTS sessions_count "
+                     "(id INTEGER PRIMARY KEY CHECK (id = 0), "
+                     "count INTEGER NOT NULL)")
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' "
+                        "AND name = 'sessions_insert'").fetchone():
+            return
+        # sessions stored before the triggers existed
+        conn.execute("INSERT OR REPLACE INTO sessions_count (id, count) "
+                     "SELECT 0, COUNT(*) FROM sessions")
+        conn.execute("CREATE TRIGGER sessions_insert AFTER INSERT ON sessions "
+                     "BEGIN UPDATE sessions_count SET count = count + 1; END")
+        conn.execute("CREATE TRIGGER sessions_delete AFTER DELETE ON sessions "
+                     "BEGIN UPDATE sessions_count SET count = count - 1; END")
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        """Connection of the current thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _purge(self, conn: sqlite3.Connection) -> None:
+        """Deletes the expired sessions and the ones beyond the limit"""
+        now = time.time()
+        if self.duration > 0 and now - self._last_purge > \
+                self.PURGE_INTERVAL:
+            self._last_purge = now
+            conn.execute("DELETE FROM sessions WHERE created_at < ?",
+                         (now - self.duration,))
+        if self.max_sessions > 0:
+            excess = conn.execute(
+                "SELECT count FROM sessions_count").fetchone()[0] - \
+                self.max_sessions
+            if excess > 0:
+                conn.execute("DELETE FROM sessions WHERE session_id IN "
+                             "(SELECT session_id FROM sessions "
+                             "ORDER BY created_at LIMIT ?)", (excess,))
+
+    def save(self, session_id: str, user_id: str) -> None:
+        """Stores a new session"""
+        with self._connection as conn:
+            conn.execute("INSERT INTO sessions "
+                         "(session_id, user_id, created_at) VALUES (?, ?, ?)",
+                         (session_id, user_id, time.time()))
+            self._purge(conn)
+
+    def get(self, session_id: str) -> dict:
+        """Returns a session, or None if it doesn't exist or has expired"""
+        row = self._connection.execute(
+            "SELECT user_id, created_at FROM sessions WHERE session_id = ?",
+            (session_id,)).fetchone()
+        if row is None:
+            return None
+        session = {
+            "user_id": row[0],
+            "created_at": datetime.fromtimestamp(row[1]),
+        }
+        if self.is_expired(session):
+            self.delete(session_id)
+            return None
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        """Deletes a session, returns False if it doesn't exist"""
+        with self._connection as conn:
+            cursor = conn.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        return cursor.rowcount > 0
+
+    def count(self) -> int:
+        """Returns the number of sessions, read from sessions_count after
+        deleting the expired ones (each session is deleted once)"""
+        with self._connection as conn:
+            if self.duration > 0:
+                conn.execute("DELETE FROM sessions WHERE created_at < ?",
+                             (time.time() - self.duration,))
+            return conn.execute(
+                "SELECT count FROM sessions_count").fetchone()[0]
+
+    def count_user_sessions(self, user_id: str) -> int:
+        """Returns the number of sessions of a user"""
+        query = "SELECT COUNT(*) FROM sessions WHERE user_id = ?"
+        values = [user_id]
+        if self.duration > 0:
+            query += " AND created_at >= ?"
+            values.append(time.time() - self.duration)
+        return self._connection.execute(query, values).fetchone()[0]
+
+    def delete_user_sessions(self, user_id: str) -> int:
+        """Deletes all sessions of a user, returns how many were deleted"""
+        with self._connection as conn:
+            cursor = conn.execute(
+                "DELETE FROM sessions WHERE user_id = ?", (user_id,))
+        return cursor.rowcount
+
+
+def get_session_store(sessions: OrderedDict = None, duration: int = 0,
+                      max_sessions: int = 0,
+                      user_ids: bool = False) -> SessionStore:
+    """
+    Creates the session store selected by SESSION_STORE:
+    "sqlite" for SQLiteSessionStore on SESSION_DB_PATH,
+    "file" for FileSessionStore on SESSION_FILE_PATH,
+    MemorySessionStore around sessions otherwise, holding user IDs
+    rather than session dictionaries with user_ids.
+    """
+    if os.getenv("SESSION_STORE") == "file":
+        file_path = os.getenv("SESSION_FILE_PATH", ".db_sessions.log")
+        return FileSessionStore(file_path, sessions, duration, max_sessions,
+                                user_ids)
+    if os.getenv("SESSION_STORE") == "sqlite":
+        db_path = os.getenv("SESSION_DB_PATH", ".db_sessions.sqlite3")
+        return SQLiteSessionStore(db_path, duration, max_sessions)
+    return MemorySessionStore(sessions, duration, max_sessions, user_ids)
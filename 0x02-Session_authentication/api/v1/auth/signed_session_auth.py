@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Module of signed session auth"""
+
+from api.v1.auth.session_auth import SessionAuth
+import base64
+from collections import OrderedDict
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+
+
+class SignedSessionAuth(SessionAuth):
+    """
+    Session Auth class with stateless session IDs.
+
+    A session ID is "<user ID>.<creation time>.<nonce>.<signature>",
+    signed with HMAC-SHA256 and SESSION_SECRET: it is verified without any
+    store lookup, so every process (or node) sharing the secret accepts it.
+    Sessions expire SESSION_DURATION seconds after their creation, which
+    must be positive. Logged out session IDs are kept in a revocation set,
+    local to the process, until they expire. Logging a user out everywhere
+    revokes the sessions of the user created before that time, until they
+    expire too: a logout does so when SESSION_MAX_REVOKED unexpired
+    sessions are already revoked.
+    """
+
+    # signature -> expiration time, oldest revocation first
+    revoked = OrderedDict()
+    # user ID -> time (ms) before which the sessions of the user are
+    # revoked, oldest first
+    revoked_users = OrderedDict()
+    _revoked_lock = threading.Lock()
+    # used without SESSION_SECRET: only this process accepts the sessions
+    _default_secret = os.urandom(32)
+
+    def __init__(self):
+        """Initializes the secret, the session duration and the
+        size of the revocation set
+
+        Raises:
+            ValueError: If SESSION_DURATION isn't a positive integer.
+        """
+        secret = os.getenv("SESSION_SECRET")
+        self._secret = secret.encode() if secret else self._default_secret
+        try:
+            self.session_duration = int(os.getenv("SESSION_DURATION", "0"))
+        except ValueError:
+            self.session_duration = 0
+        if self.session_duration <= 0:
+            raise ValueError("SESSION_DURATION must be a positive number "
+                             "of seconds for signed sessions")
+        try:
+            self.max_revoked = int(os.getenv("SESSION_MAX_REVOKED", "10000"))
+        except ValueError:
+            self.max_revoked = 10000
+
+    def _sign(self, payload: str) -> str:
+        """Returns the signature of payload"""
+        digest = hmac.new(self._secret, payload.encode(),
+                          hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+    def create_session(self, user_id: str = None) -> str:
+        """
+        Creates a new signed session ID.
+
+        Args:
+            user_id (str): The ID of the user
+            to create a session for. Defaults to None.
+
+        Returns:
+            str: The signed session ID,
+            or None if user_id is None or not a string.
+        """
+        if user_id is None or type(user_id) is not str:
+            return None
+        created_at = int(time.time() * 1000)
+        payload = "{}.{}.{}".format(user_id, created_at,
+                                    secrets.token_urlsafe(8))
+        return "{}.{}".format(payload, self._sign(payload))
+
+    def user_id_for_session_id(self, session_id: str = None) -> str:
+        """
+        Returns the user ID of a signed session ID.
+
+        Args:
+            session_id (str): The signed session ID.
+            Defaults to None.
+
+        Returns:
+            str: The ID of the user, or None if the session ID is invalid,
+            expired or revoked.
+        """
+        if session_id is None or type(session_id) is not str:
+            return None
+        parts = session_id.rsplit(".", 3)
+        if len(parts) != 4:
+            return None
+        user_id, created_at, _, signature = parts
+        payload = session_id[:-len(signature) - 1]
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+        try:
+            created_at = int(created_at)
+        except ValueError:
+            return None
+        if self._expires_at(created_at) < time.time():
+            return None
+        if signature in self.revoked:
+            return None
+        if created_at < self.revoked_users.get(user_id, 0):
+            return None
+        return user_id
+
+    def _expires_at(self, created_at: int) -> float:
+        """Returns the expiration time of a session"""
+        return created_at / 1000 + self.session_duration
+
+    def _prune_revoked(self, now: float) -> None:
+        """Forgets the revocations of expired sessions, with the lock"""
+        # users are revoked in time order: their sessions expire in order
+        while self.revoked_users:
+            user_id, revoked_at = next(iter(self.revoked_users.items()))
+            if self._expires_at(revoked_at) >= now:
+                break
+            del self.revoked_users[user_id]
+        # revoked sessions mostly expire in revocation order
+        while self.revoked:
+            if next(iter(self.revoked.values())) >= now:
+                break
+            self.revoked.popitem(last=False)
+        if len(self.revoked) >= self.max_revoked:
+            for signature in [signature for signature, expires_at
+                              in self.revoked.items() if expires_at < now]:
+                del self.revoked[signature]
+
+    def count_sessions(self, user_id: str = None) -> int:
+        """Sessions are stateless: their number is unknown"""
+        return None
+
+    def count_active_sessions(self) -> int:
+        """Sessions are stateless: their number is unknown"""
+        return None
+
+    def destroy_all_sessions(self, user_id: str = None) -> int:
+        """
+        Revokes all sessions of a user created until now / logout
+        everywhere.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            int: 0, the number of revoked sessions is unknown.
+        """
+        if user_id is None or type(user_id) is not str:
+            return 0
+        with self._revoked_lock:
+            now = time.time()
+            self._prune_revoked(now)
+            self._revoke_user(user_id, now)
+        return 0
+
+    def _revoke_user(self, user_id: str, now: float) -> None:
+        """Revokes the sessions of a user created until now, with the lock"""
+        self.revoked_users.pop(user_id, None)
+        self.revoked_users[user_id] = int(now * 1000) + 1
+
+    def destroy_session(self, request=None):
+        """Revokes the signed session ID of the request / logout, or all
+        sessions of its user when SESSION_MAX_REVOKED unexpired sessions
+        are already revoked"""
+        if request is None:
+            return False
+
+        session_id = self.session_cookie(request)
+        if session_id is None:
+            return False
+
+        if self.user_id_for_session_id(session_id) is None:
+            return False
+
+        user_id, created_at, _, signature = session_id.rsplit(".", 3)
+        expires_at = self._expires_at(int(created_at))
+        with self._revoked_lock:
+            now = time.time()
+            self._prune_revoked(now)
+            if len(self.revoked) >= self.max_revoked:
+                self._revoke_user(user_id, now)
+            else:
+                self.revoked[signature] = expires_at
+        return True
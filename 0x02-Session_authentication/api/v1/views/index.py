@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """ Module of Index views
 """
-from flask import jsonify, abort
+from flask import Response, jsonify, abort
+from api.v1 import instrumentation
 from api.v1.views import app_views
 
 
@@ -18,13 +19,31 @@ def status() -> str:
 def stats() -> str:
     """ GET /api/v1/stats
     Return:
-      - the number of each objects
+      - the number of each objects, of users created each day, of
+        active sessions (null if unknown) and of authentication failures
     """
+    from api.v1.app import auth
     from models.user import User
     stats = {}
     stats['users'] = User.count()
+    stats['users_created_per_day'] = User.created_per_day()
+    if hasattr(auth, 'count_active_sessions'):
+        stats['active_sessions'] = auth.count_active_sessions()
+    stats['auth_failures'] = instrumentation.auth_failures.value
     return jsonify(stats)
 
+
+@app_views.route('/metrics/', methods=['GET'], strict_slashes=False)
+def metrics() -> str:
+    """ GET /api/v1/metrics
+    Return:
+      - the counters and the histograms of the API in the Prometheus
+        text format
+    """
+    return Response(instrumentation.render_metrics(),
+                    mimetype='text/plain; version=0.0.4')
+
+
 @app_views.route('/unauthorized/', methods=['GET'], strict_slashes=False)
 def unauthorized() -> str:
     """ GET /api/v1/unauthorized
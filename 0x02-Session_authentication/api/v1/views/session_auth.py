@@ -3,6 +3,7 @@
 
 
 from flask import jsonify, request, abort
+from api.v1 import instrumentation
 from api.v1.views import app_views
 from models.user import User
 from api.v1.app import auth
@@ -23,6 +24,8 @@ def login():
     users = User.search({"email": email})
 
     if not users:
+        # a 404 rather than a 401: not counted by after_request
+        instrumentation.auth_failures.increment()
         return jsonify({"error": "no user found for this email"}), 404
 
     user = users[0]
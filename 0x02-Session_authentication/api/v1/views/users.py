@@ -2,18 +2,278 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from concurrent.futures import ProcessPoolExecutor
+from flask import Response, abort, jsonify, request, url_for
 from models.user import User
+from os import getenv
+from typing import List
+import json
+import os
+
+
+STREAM_BATCH_SIZE = 500
+FILTERS = ("email", "first_name")
+# lines of a bulk import validated and hashed by one worker at a time
+BULK_CHUNK_SIZE = int(getenv("BULK_CHUNK_SIZE", "1000"))
+# 0: one worker per CPU, 1: no worker process
+BULK_WORKERS = int(getenv("BULK_WORKERS", "0")) or os.cpu_count() or 1
+_bulk_pool = None
+
+
+def parse_fields() -> tuple:
+    """ Return the attributes listed by the `fields` query parameter,
+    or None to return all of them
+
+    Raise a ValueError if an attribute is unknown
+    """
+    fields = request.args.get("fields")
+    if fields is None:
+        return None
+    fields = tuple(field.strip() for field in fields.split(","))
+    for field in fields:
+        if field not in User.fields or field[0] == "_":
+            raise ValueError("unknown field: {}".format(field))
+    return fields
+
+
+def find_users(filters: dict, after: str = None, limit: int = None):
+    """ Return the users matching filters, ordered by ID, starting after
+    the ID `after`
+    """
+    if not filters:
+        return User.page(after, limit)
+    users = sorted(User.search(filters), key=lambda user: user.id)
+    if after is not None:
+        users = [user for user in users if user.id > after]
+    return users if limit is None else users[:limit]
+
+
+def conditional_user(user: User) -> Response:
+    """ Response of one user with a weak ETag derived from its ID and its
+    last update: the user is only serialized if the ETag doesn't match
+    If-None-Match
+    """
+    etag = "{}-{}".format(user.id, user.updated_at.isoformat())
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(user.to_json())
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def last_modified(users: List[User]):
+    """ Most recent update of users, None if there isn't any user
+    """
+    return max((user.updated_at for user in users), default=None)
+
+
+def user_batches(filters: dict, after: str = None, limit: int = None):
+    """ Generate the users matching filters ordered by ID, by batches of
+    STREAM_BATCH_SIZE when they are read by page
+    """
+    if filters:
+        # the search returns all matching users at once
+        yield find_users(filters, after, limit)
+        return
+    while limit is None or limit > 0:
+        size = STREAM_BATCH_SIZE if limit is None \
+            else min(limit, STREAM_BATCH_SIZE)
+        users = User.page(after, size)
+        yield users
+        if len(users) < size:
+            break
+        after = users[-1].id
+        if limit is not None:
+            limit -= len(users)
+
+
+def stream_users(filters: dict, after: str = None, limit: int = None,
+                 fields: tuple = None):
+    """ Generate the JSON list of users ordered by ID
+    """
+    yield "["
+    separator = ""
+    for users in user_batches(filters, after, limit):
+        for user in users:
+            yield separator + json.dumps(user.to_json(fields=fields))
+            separator = ","
+    yield "]"
 
 
 @app_views.route("/users", methods=["GET"], strict_slashes=False)
 def view_all_users() -> str:
     """GET /api/v1/users
+    Query parameters (optional):
+      - fields: comma separated list of the attributes to return
+      - email, first_name: only return users with this value
+      - limit: maximum number of users
+      - after: ID of the last user of the previous page
+      - stream: 1 to stream the list
     Return:
-      - list of all User objects JSON represented
+      - list of all User objects JSON represented, ordered by ID
+        if limit, after or stream is given; the Link header gives
+        the next page and, if not streamed, Last-Modified the most
+        recent update of the listed users
+      - 400 if limit isn't a positive integer or a field is unknown
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    try:
+        fields = parse_fields()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    filters = {key: request.args.get(key) for key in FILTERS
+               if key in request.args}
+    limit = request.args.get("limit")
+    after = request.args.get("after")
+    stream = request.args.get("stream") in ("1", "true")
+    if limit is None and after is None and not stream:
+        users = User.search(filters) if filters else User.all()
+        response = jsonify([user.to_json(fields=fields) for user in users])
+        response.last_modified = last_modified(users)
+        return response
+
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            return jsonify({"error": "limit must be a positive integer"}), 400
+    if stream:
+        return Response(stream_users(filters, after, limit, fields),
+                        mimetype="application/json")
+
+    users = find_users(filters, after, None if limit is None else limit + 1)
+    has_next = limit is not None and len(users) > limit
+    users = users[:limit]
+    response = jsonify([user.to_json(fields=fields) for user in users])
+    response.last_modified = last_modified(users)
+    if has_next:
+        args = request.args.to_dict()
+        args.update(limit=limit, after=users[-1].id)
+        next_url = url_for("app_views.view_all_users", **args)
+        response.headers["Link"] = '<{}>; rel="next"'.format(next_url)
+    return response
+
+
+@app_views.route("/users/export", methods=["GET"], strict_slashes=False)
+def export_users() -> str:
+    """GET /api/v1/users/export
+    Query parameters (optional):
+      - fields: comma separated list of the attributes to return
+    Return:
+      - all User objects JSON represented, one per line, ordered by ID
+      - 400 if a field is unknown
+    """
+    try:
+        fields = parse_fields()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def generate():
+        for users in user_batches(None):
+            yield "".join(json.dumps(user.to_json(fields=fields)) + "\n"
+                          for user in users)
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+def name_error(rj: dict) -> str:
+    """ Return the error message of a first_name or last_name which isn't
+    a string (first_name is indexed), or None
+    """
+    for attr in ("first_name", "last_name"):
+        if rj.get(attr) is not None and not isinstance(rj.get(attr), str):
+            return "{} must be a string".format(attr)
+    return None
+
+
+def parse_user_lines(lines: List[bytes], first_line: int) -> list:
+    """ Validate JSON lines describing users and hash their password
+
+    Return, for each non blank line, the serialized User or an error
+    message prefixed by the line number
+    """
+    results = []
+    for number, line in enumerate(lines, first_line):
+        if not line.strip():
+            continue
+        try:
+            rj = json.loads(line)
+        except ValueError:
+            rj = None
+        if not isinstance(rj, dict):
+            error_msg = "Wrong format"
+        elif rj.get("email", "") == "":
+            error_msg = "email missing"
+        elif rj.get("password", "") == "":
+            error_msg = "password missing"
+        elif name_error(rj) is not None:
+            error_msg = name_error(rj)
+        else:
+            user = User()
+            user.email = rj.get("email")
+            user.password = rj.get("password")
+            user.first_name = rj.get("first_name")
+            user.last_name = rj.get("last_name")
+            results.append(user.to_json(True))
+            continue
+        results.append("line {}: {}".format(number, error_msg))
+    return results
+
+
+def bulk_pool() -> ProcessPoolExecutor:
+    """ Worker processes of the bulk imports, started on first use
+    """
+    global _bulk_pool
+    if _bulk_pool is None:
+        _bulk_pool = ProcessPoolExecutor(BULK_WORKERS)
+    return _bulk_pool
+
+
+@app_views.route("/users/bulk", methods=["POST"], strict_slashes=False)
+def create_users() -> str:
+    """POST /api/v1/users/bulk
+    Body: one JSON object per line with
+      - email
+      - password
+      - last_name (optional)
+      - first_name (optional)
+    Return:
+      - number of created Users: all the Users are saved at once
+      - 400 with the errors of each invalid line if can't create
+        all the Users (then none is created)
+    """
+    chunks = []
+    chunk = []
+    for line in request.stream:
+        chunk.append(line)
+        if len(chunk) == BULK_CHUNK_SIZE:
+            chunks.append(chunk)
+            chunk = []
+    if chunk:
+        chunks.append(chunk)
+
+    first_lines = range(1, len(chunks) * BULK_CHUNK_SIZE, BULK_CHUNK_SIZE)
+    if len(chunks) > 1 and BULK_WORKERS > 1:
+        results = bulk_pool().map(parse_user_lines, chunks, first_lines)
+    else:
+        results = map(parse_user_lines, chunks, first_lines)
+    users = []
+    errors = []
+    for result in results:
+        for item in result:
+            if isinstance(item, str):
+                errors.append(item)
+            else:
+                users.append(User(**item))
+    if errors:
+        return jsonify({"error": errors}), 400
+    try:
+        if users:
+            User.save_many(users)
+    except Exception as e:
+        return jsonify({"error": ["Can't create Users: {}".format(e)]}), 400
+    return jsonify({"created": len(users)}), 201
 
 
 @app_views.route("/users/<user_id>", methods=["GET"], strict_slashes=False)
@@ -22,17 +282,18 @@ def view_one_user(user_id: str = None) -> str:
     Path parameter:
       - User ID
     Return:
-      - User object JSON represented
+      - User object JSON represented, with a weak ETag
+      - 304 if the ETag matches If-None-Match
       - 404 if the User ID doesn't exist
     """
     if user_id == "me" and request.current_user is None:
         abort(404)
     if user_id == "me" and request.current_user is not None:
-        return jsonify(request.current_user.to_json())
+        return conditional_user(request.current_user)
     user = User.get(user_id)
     if user is None:
         abort(404)
-    return jsonify(user.to_json())
+    return conditional_user(user)
 
 
 @app_views.route("/users/<user_id>", methods=["DELETE"], strict_slashes=False)
@@ -50,6 +311,9 @@ def delete_user(user_id: str = None) -> str:
     if user is None:
         abort(404)
     user.remove()
+    from api.v1.app import auth
+    if hasattr(auth, "destroy_all_sessions"):
+        auth.destroy_all_sessions(user.id)
     return jsonify({}), 200
 
 
@@ -77,6 +341,8 @@ def create_user() -> str:
         error_msg = "email missing"
     if error_msg is None and rj.get("password", "") == "":
         error_msg = "password missing"
+    if error_msg is None:
+        error_msg = name_error(rj)
     if error_msg is None:
         try:
             user = User()
@@ -102,7 +368,8 @@ def update_user(user_id: str = None) -> str:
     Return:
       - User object JSON represented
       - 404 if the User ID doesn't exist
-      - 400 if can't update the User
+      - 400 if can't update the User (first_name or last_name isn't a
+        string)
     """
     if user_id is None:
         abort(404)
@@ -116,9 +383,14 @@ def update_user(user_id: str = None) -> str:
         rj = None
     if rj is None:
         return jsonify({"error": "Wrong format"}), 400
+    if name_error(rj) is not None:
+        return jsonify({"error": name_error(rj)}), 400
     if rj.get("first_name") is not None:
         user.first_name = rj.get("first_name")
     if rj.get("last_name") is not None:
         user.last_name = rj.get("last_name")
-    user.save()
+    try:
+        user.save()
+    except ValueError as e:
+        return jsonify({"error": "Can't update User: {}".format(e)}), 400
     return jsonify(user.to_json()), 200
@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+""" Models package: select the storage engine
+"""
+from os import getenv
+
+
+if getenv("STORAGE_ENGINE") == "sqlite":
+    from models.engine.sqlite_storage import SQLiteStorage
+    storage = SQLiteStorage()
+else:
+    from models.engine.file_storage import FileStorage
+    storage = FileStorage()
@@ -3,37 +3,77 @@
 """
 from datetime import datetime
 from typing import TypeVar, List, Iterable
-from os import path
-import json
+from models import storage
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
-DATA = {}
+# stored timestamps keep the microseconds so that every save changes
+# `updated_at`; the first TIMESTAMP_LENGTH characters are returned
+STORAGE_TIMESTAMP_FORMAT = TIMESTAMP_FORMAT + ".%f"
+TIMESTAMP_LENGTH = len("YYYY-MM-DDTHH:MM:SS")
 
 
 class Base():
     """ Base class
+
+    Instances use __slots__ (subclasses must declare theirs) and keep the
+    timestamps as read from the storage: datetime objects are only built
+    when `created_at` / `updated_at` are accessed.
     """
 
+    __slots__ = ('id', '_created_at', '_created_at_json',
+                 '_updated_at', '_updated_at_json')
+
+    # Serialized attributes, in order
+    fields = ('id', 'created_at', 'updated_at')
+    # Secondary indexes: attribute name -> unique flag
+    indexes = {}
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
-        s_class = str(self.__class__.__name__)
-        if DATA.get(s_class) is None:
-            DATA[s_class] = {}
-
-        self.id = kwargs.get('id', str(uuid.uuid4()))
-        if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
-        else:
-            self.created_at = datetime.utcnow()
-        if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
-        else:
-            self.updated_at = datetime.utcnow()
+        self.id = kwargs.get('id')
+        if self.id is None:
+            self.id = str(uuid.uuid4())
+        self._created_at_json = kwargs.get('created_at')
+        self._created_at = None
+        if self._created_at_json is None:
+            self._created_at = datetime.utcnow()
+        self._updated_at_json = kwargs.get('updated_at')
+        self._updated_at = None
+        if self._updated_at_json is None:
+            self._updated_at = datetime.utcnow()
+
+    @property
+    def created_at(self) -> datetime:
+        """ Getter of the creation date
+        """
+        if self._created_at is None:
+            self._created_at = datetime.fromisoformat(self._created_at_json)
+        return self._created_at
+
+    @created_at.setter
+    def created_at(self, value: datetime):
+        """ Setter of the creation date
+        """
+        self._created_at = value
+        self._created_at_json = None
+
+    @property
+    def updated_at(self) -> datetime:
+        """ Getter of the last update date
+        """
+        if self._updated_at is None:
+            self._updated_at = datetime.fromisoformat(self._updated_at_json)
+        return self._updated_at
+
+    @updated_at.setter
+    def updated_at(self, value: datetime):
+        """ Setter of the last update date
+        """
+        self._updated_at = value
+        self._updated_at_json = None
 
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
@@ -44,16 +84,32 @@ class Base():
             return False
         return (self.id == other.id)
 
-    def to_json(self, for_serialization: bool = False) -> dict:
+    def to_json(self, for_serialization: bool = False,
+                fields: tuple = None) -> dict:
         """ Convert the object a JSON dictionary
+
+        If `fields` is given, only these attributes are converted.
         """
+        if self._created_at_json is None:
+            self._created_at_json = self._created_at.strftime(
+                STORAGE_TIMESTAMP_FORMAT)
+        if self._updated_at_json is None:
+            self._updated_at_json = self._updated_at.strftime(
+                STORAGE_TIMESTAMP_FORMAT)
+        length = None if for_serialization else TIMESTAMP_LENGTH
+
         result = {}
-        for key, value in self.__dict__.items():
+        for key in (self.fields if fields is None else fields):
             if not for_serialization and key[0] == '_':
                 continue
-            if type(value) is datetime:
-                result[key] = value.strftime(TIMESTAMP_FORMAT)
+            if key == 'created_at':
+                result[key] = self._created_at_json[:length]
+            elif key == 'updated_at':
+                result[key] = self._updated_at_json[:length]
             else:
+                value = getattr(self, key)
+                if type(value) is datetime:
+                    value = value.strftime(TIMESTAMP_FORMAT)
                 result[key] = value
         return result
 
@@ -61,52 +117,45 @@ class Base():
     def load_from_file(cls):
         """ Load all objects from file
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
-
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        storage.load(cls)
 
     @classmethod
     def save_to_file(cls):
         """ Save all objects to file
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
-
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+        storage.save_to_file(cls)
 
     def save(self):
         """ Save current object
         """
-        s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        storage.put(self)
+
+    @classmethod
+    def save_many(cls, objs: List[TypeVar('Base')]):
+        """ Save several objects with a single write
+        """
+        now = datetime.utcnow()
+        for obj in objs:
+            obj.updated_at = now
+        storage.put_many(cls, objs)
 
     def remove(self):
         """ Remove object
         """
-        s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        storage.delete(self)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
-        s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return storage.count(cls)
+
+    @classmethod
+    def created_per_day(cls) -> dict:
+        """ Number of objects created each day ("YYYY-MM-DD")
+        """
+        return storage.created_per_day(cls)
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -114,24 +163,22 @@ class Base():
         """
         return cls.search()
 
+    @classmethod
+    def page(cls, after: str = None,
+             limit: int = None) -> List[TypeVar('Base')]:
+        """ Return at most `limit` objects ordered by ID,
+        starting after the ID `after`
+        """
+        return storage.page(cls, after, limit)
+
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
-        s_class = cls.__name__
-        return DATA[s_class].get(id)
+        return storage.get(cls, id)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
         """
-        s_class = cls.__name__
-        def _search(obj):
-            if len(attributes) == 0:
-                return True
-            for k, v in attributes.items():
-                if (getattr(obj, k) != v):
-                    return False
-            return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+        return storage.search(cls, attributes)
@@ -0,0 +1,593 @@
+#!/usr/bin/env python3
+""" JSON file storage engine
+"""
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import MutableMapping
+from datetime import datetime
+from os import getenv, path
+from typing import TypeVar, List
+import atexit
+import json
+import mmap
+import os
+import threading
+import time
+
+
+# "snapshot": rewrite .db_<Class>.json on every change
+# "journal": append changes to .db_<Class>.log, compacted periodically
+PERSISTENCE_MODE = getenv("PERSISTENCE_MODE", "snapshot")
+JOURNAL_COMPACT_SIZE = int(getenv("JOURNAL_COMPACT_SIZE", "1000"))
+# "sync": write every change before save()/remove() return
+# "batched": coalesce changes and write them from a background thread
+FLUSH_MODE = getenv("FLUSH_MODE", "sync")
+FLUSH_INTERVAL = float(getenv("FLUSH_INTERVAL", "1.0"))
+FLUSH_MAX_PENDING = int(getenv("FLUSH_MAX_PENDING", "100"))
+FLUSH_FSYNC = getenv("FLUSH_FSYNC", "0").lower() in ("1", "true", "yes")
+# also write .db_<Class>.jsonl and materialize objects from it on demand
+LAZY_LOAD = getenv("LAZY_LOAD", "0").lower() in ("1", "true", "yes")
+DATA = {}
+# class name -> (class, pending journal records), written by flush()
+PENDING = {}
+# class name -> number of records in the journal since the last snapshot
+JOURNAL_SIZES = {}
+# class name -> attribute -> value -> {object id: None}
+INDEXES = {}
+# class name -> object id -> {attribute: indexed value}
+INDEXED_VALUES = {}
+# class name -> sorted list of object ids, built on first use
+SORTED_IDS = {}
+# class name -> creation day -> number of objects, built on first use
+CREATED_PER_DAY = {}
+# guards DATA, indexes and pending changes against the flush thread
+LOCK = threading.RLock()
+
+
+def _write_file(f):
+    """ Push the file content to the disk if FLUSH_FSYNC is set
+    """
+    if FLUSH_FSYNC:
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class LazyObjects(MutableMapping):
+    """ Objects of a class materialized on first access
+
+    The JSON-lines file (one serialized object per line) is memory-mapped
+    and only scanned for line offsets when the objects are first needed;
+    each object is built from its line the first time it is accessed.
+    """
+
+    ID_PREFIX = b'{"id": "'
+
+    def __init__(self, cls, file_path: str):
+        """ Initialize the mapping without reading the file
+        """
+        self._cls = cls
+        self._file_path = file_path
+        self._mm = None
+        # object id -> object, or (start, end) offsets of its line
+        self._items = None
+
+    def _scan(self) -> dict:
+        """ Index the line offsets of the file
+
+        The offsets are published once complete, under LOCK, so that a
+        concurrent first access never sees a partial mapping.
+        """
+        if self._items is not None:
+            return self._items
+        with LOCK:
+            if self._items is not None:
+                return self._items
+            items = {}
+            with open(self._file_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size > 0:
+                    self._mm = mmap.mmap(f.fileno(), 0,
+                                         access=mmap.ACCESS_READ)
+            mm = self._mm
+            start = 0
+            size = len(mm) if mm is not None else 0
+            while start < size:
+                end = mm.find(b"\n", start)
+                if end == -1:
+                    end = size
+                if end > start:
+                    items[self._line_id(start, end)] = (start, end)
+                start = end + 1
+            self._items = items
+            return items
+
+    def _line_id(self, start: int, end: int) -> str:
+        """ Return the object id of a line, without parsing it if possible
+        """
+        mm = self._mm
+        prefix_end = start + len(self.ID_PREFIX)
+        if mm[start:prefix_end] == self.ID_PREFIX:
+            id_end = mm.find(b'"', prefix_end, end)
+            if id_end != -1:
+                return mm[prefix_end:id_end].decode()
+        return json.loads(mm[start:end])['id']
+
+    def is_loaded(self, obj_id: str) -> bool:
+        """ Tell if the object has already been materialized
+        """
+        return not isinstance(self._scan()[obj_id], tuple)
+
+    def raw(self, obj_id: str) -> dict:
+        """ Return the serialized object, without materializing it
+        """
+        item = self._scan()[obj_id]
+        if isinstance(item, tuple):
+            return json.loads(self._mm[item[0]:item[1]])
+        return item.to_json(True)
+
+    def __getitem__(self, obj_id: str):
+        item = self._scan()[obj_id]
+        if isinstance(item, tuple):
+            item = self._cls(**json.loads(self._mm[item[0]:item[1]]))
+            self._items[obj_id] = item
+        return item
+
+    def __setitem__(self, obj_id: str, obj):
+        self._scan()[obj_id] = obj
+
+    def __delitem__(self, obj_id: str):
+        del self._scan()[obj_id]
+
+    def __iter__(self):
+        return iter(self._scan())
+
+    def __len__(self) -> int:
+        return len(self._scan())
+
+
+class FileStorage():
+    """ Objects kept in memory and persisted in .db_<Class>.json files
+    """
+
+    def __init__(self):
+        """ Initialize the storage
+        """
+        self._flush_event = threading.Event()
+        self._flush_thread = None
+        # called with (seconds, operation) after each write to disk
+        self.observer = None
+        atexit.register(self.flush)
+
+    def _observe(self, operation: str, start: float):
+        """ Report the duration of a write started at `start`
+        """
+        if self.observer is not None:
+            self.observer(time.perf_counter() - start, operation)
+
+    def load(self, cls):
+        """ Load all objects of a class from file
+        """
+        s_class = cls.__name__
+        file_path = ".db_{}.json".format(s_class)
+        lines_path = ".db_{}.jsonl".format(s_class)
+        if s_class in PENDING:
+            self.flush()
+        with LOCK:
+            SORTED_IDS.pop(s_class, None)
+            CREATED_PER_DAY.pop(s_class, None)
+            # the JSON-lines file is only current if written with the
+            # last snapshot: it's removed by snapshots without LAZY_LOAD
+            if LAZY_LOAD and path.exists(lines_path) and \
+                    (not path.exists(file_path) or
+                     os.stat(lines_path).st_mtime_ns >=
+                     os.stat(file_path).st_mtime_ns):
+                DATA[s_class] = LazyObjects(cls, lines_path)
+                self._replay_journal(cls)
+                # indexes are built on first use
+                INDEXES.pop(s_class, None)
+                INDEXED_VALUES.pop(s_class, None)
+                return
+
+            DATA[s_class] = {}
+            if path.exists(file_path):
+                with open(file_path, 'r') as f:
+                    objs_json = json.load(f)
+                    for obj_id, obj_json in objs_json.items():
+                        DATA[s_class][obj_id] = cls(**obj_json)
+            self._replay_journal(cls)
+            self._reindex(cls)
+            if LAZY_LOAD and path.exists(file_path):
+                # write the JSON-lines file for the next start
+                self.save_to_file(cls)
+
+    def _replay_journal(self, cls):
+        """ Apply the journal records written after the last snapshot
+        """
+        s_class = cls.__name__
+        journal_path = ".db_{}.log".format(s_class)
+        JOURNAL_SIZES[s_class] = 0
+        if not path.exists(journal_path):
+            return
+
+        with open(journal_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # partially written record (crash during append)
+                    continue
+                if record.get('op') == 'put':
+                    DATA[s_class][record['id']] = cls(**record['obj'])
+                elif record.get('op') == 'del':
+                    DATA[s_class].pop(record['id'], None)
+                JOURNAL_SIZES[s_class] += 1
+
+    def save_to_file(self, cls):
+        """ Save all objects of a class to file
+        """
+        s_class = cls.__name__
+        file_path = ".db_{}.json".format(s_class)
+        with LOCK:
+            start = time.perf_counter()
+            objs = DATA.get(s_class, {})
+            objs_json = {}
+            for obj_id in objs:
+                if isinstance(objs, LazyObjects) and \
+                        not objs.is_loaded(obj_id):
+                    objs_json[obj_id] = objs.raw(obj_id)
+                else:
+                    objs_json[obj_id] = objs[obj_id].to_json(True)
+
+            tmp_path = "{}.tmp".format(file_path)
+            with open(tmp_path, 'w') as f:
+                json.dump(objs_json, f)
+                _write_file(f)
+            os.replace(tmp_path, file_path)
+
+            lines_path = ".db_{}.jsonl".format(s_class)
+            if LAZY_LOAD:
+                tmp_path = "{}.tmp".format(lines_path)
+                with open(tmp_path, 'w') as f:
+                    f.write("".join(json.dumps(obj_json) + "\n"
+                                    for obj_json in objs_json.values()))
+                    _write_file(f)
+                os.replace(tmp_path, lines_path)
+            elif path.exists(lines_path):
+                # now stale: a LAZY_LOAD start would read it instead
+                os.remove(lines_path)
+
+            # the snapshot now contains every journaled change
+            journal_path = ".db_{}.log".format(s_class)
+            if path.exists(journal_path):
+                os.remove(journal_path)
+            JOURNAL_SIZES[s_class] = 0
+            self._observe("snapshot", start)
+
+    def append_to_journal(self, op: str, obj: TypeVar('Base')):
+        """ Append one put/del record to the journal file
+        """
+        self._write_journal(obj.__class__, [self._journal_record(op, obj)])
+
+    @staticmethod
+    def _journal_record(op: str, obj: TypeVar('Base')) -> dict:
+        """ Build the journal record of one change
+        """
+        record = {'op': op, 'id': obj.id}
+        if op == 'put':
+            record['obj'] = obj.to_json(True)
+        return record
+
+    def _write_journal(self, cls, records: List[dict]):
+        """ Append records to the journal file, compacting it if needed
+        """
+        s_class = cls.__name__
+        journal_path = ".db_{}.log".format(s_class)
+        with LOCK:
+            start = time.perf_counter()
+            with open(journal_path, 'a') as f:
+                f.write("".join(json.dumps(r) + "\n" for r in records))
+                _write_file(f)
+            self._observe("journal", start)
+            JOURNAL_SIZES[s_class] = JOURNAL_SIZES.get(s_class, 0) + \
+                len(records)
+            if JOURNAL_SIZES[s_class] >= JOURNAL_COMPACT_SIZE:
+                self.save_to_file(cls)
+
+    def _persist(self, op: str, obj: TypeVar('Base')):
+        """ Persist one change according to PERSISTENCE_MODE and FLUSH_MODE
+        """
+        self._persist_all(op, obj.__class__, [obj])
+
+    def _persist_all(self, op: str, cls, objs: List[TypeVar('Base')]):
+        """ Persist the same change of several objects of a class at once
+        """
+        if FLUSH_MODE != "batched":
+            if PERSISTENCE_MODE == "journal":
+                self._write_journal(cls, [self._journal_record(op, obj)
+                                          for obj in objs])
+            else:
+                self.save_to_file(cls)
+            return
+
+        with LOCK:
+            records = PENDING.setdefault(cls.__name__, (cls, []))[1]
+            # snapshot mode rewrites the whole file: only the count matters
+            if PERSISTENCE_MODE == "journal":
+                records.extend(self._journal_record(op, obj)
+                               for obj in objs)
+            else:
+                records.extend([None] * len(objs))
+            size = len(records)
+        self._start_flush_thread()
+        if size >= FLUSH_MAX_PENDING:
+            self._flush_event.set()
+
+    def flush(self):
+        """ Write all pending changes to disk
+        """
+        with LOCK:
+            pending = list(PENDING.values())
+            PENDING.clear()
+            for cls, records in pending:
+                if PERSISTENCE_MODE == "journal":
+                    self._write_journal(cls, records)
+                else:
+                    self.save_to_file(cls)
+
+    def _flush_loop(self):
+        """ Background thread flushing pending changes
+        """
+        while True:
+            self._flush_event.wait(FLUSH_INTERVAL)
+            self._flush_event.clear()
+            self.flush()
+
+    def _start_flush_thread(self):
+        """ Start the background flush thread once
+        """
+        if self._flush_thread is None:
+            self._flush_thread = threading.Thread(target=self._flush_loop,
+                                                  daemon=True)
+            self._flush_thread.start()
+
+    def _reindex(self, cls):
+        """ Rebuild all secondary indexes of a class from DATA
+        """
+        s_class = cls.__name__
+        INDEXES[s_class] = {attr: {} for attr in cls.indexes}
+        INDEXED_VALUES[s_class] = {}
+        objs = DATA.get(s_class, {})
+        for obj_id in objs:
+            if isinstance(objs, LazyObjects) and not objs.is_loaded(obj_id):
+                # index the serialized object: don't materialize it
+                obj_json = objs.raw(obj_id)
+                self._index_values(cls, obj_id, {
+                    attr: obj_json.get(attr) for attr in cls.indexes})
+            else:
+                self._index_add(objs[obj_id])
+
+    def _index_add(self, obj: TypeVar('Base')):
+        """ Add an object to the secondary indexes
+        """
+        self._index_values(obj.__class__, obj.id, {
+            attr: getattr(obj, attr, None) for attr in obj.__class__.indexes})
+
+    def _index_values(self, cls, obj_id: str, values: dict):
+        """ Add the indexed values of an object to the secondary indexes
+        """
+        s_class = cls.__name__
+        for attr, value in values.items():
+            INDEXES[s_class][attr].setdefault(value, {})[obj_id] = None
+        INDEXED_VALUES[s_class][obj_id] = values
+
+    def _index_remove(self, obj: TypeVar('Base')):
+        """ Remove an object from the secondary indexes
+        """
+        s_class = obj.__class__.__name__
+        values = INDEXED_VALUES[s_class].pop(obj.id, {})
+        for attr, value in values.items():
+            ids = INDEXES[s_class][attr].get(value)
+            if ids is None:
+                continue
+            ids.pop(obj.id, None)
+            if len(ids) == 0:
+                del INDEXES[s_class][attr][value]
+
+    def _check_unique(self, obj: TypeVar('Base')):
+        """ Raise a ValueError if an indexed attribute isn't a string or
+        an unique attribute is already used
+        """
+        s_class = obj.__class__.__name__
+        for attr, unique in obj.__class__.indexes.items():
+            value = getattr(obj, attr, None)
+            if value is not None and not isinstance(value, str):
+                raise ValueError("{} must be a string".format(attr))
+            if not unique or value is None:
+                continue
+            ids = INDEXES[s_class][attr].get(value, {})
+            if any(obj_id != obj.id for obj_id in ids):
+                raise ValueError("{} already exists".format(attr))
+
+    @staticmethod
+    def _restore_indexed(objs: List[TypeVar('Base')]):
+        """ Put back the stored indexed values of objects changed in place
+        whose put is rejected, so that they still match the indexes
+        """
+        for obj in objs:
+            s_class = obj.__class__.__name__
+            objs_by_id = DATA.get(s_class, {})
+            if obj.id not in objs_by_id or objs_by_id[obj.id] is not obj:
+                continue
+            values = INDEXED_VALUES[s_class].get(obj.id, {})
+            for attr, value in values.items():
+                setattr(obj, attr, value)
+
+    @staticmethod
+    def _count_created(s_class: str, created_at, amount: int):
+        """ Update the number of objects created the day of created_at
+        """
+        days = CREATED_PER_DAY[s_class]
+        day = created_at.strftime("%Y-%m-%d")
+        days[day] = days.get(day, 0) + amount
+        if days[day] == 0:
+            del days[day]
+
+    def _add_id(self, obj: TypeVar('Base')):
+        """ Update the sorted ids and the creation days with a new object
+        """
+        s_class = obj.__class__.__name__
+        if s_class in SORTED_IDS:
+            insort(SORTED_IDS[s_class], obj.id)
+        if s_class in CREATED_PER_DAY:
+            self._count_created(s_class, obj.created_at, 1)
+
+    def put(self, obj: TypeVar('Base')):
+        """ Store an object
+        """
+        s_class = obj.__class__.__name__
+        with LOCK:
+            DATA.setdefault(s_class, {})
+            if INDEXES.get(s_class) is None:
+                self._reindex(obj.__class__)
+            try:
+                self._check_unique(obj)
+            except ValueError:
+                self._restore_indexed([obj])
+                raise
+            self._index_remove(obj)
+            if obj.id not in DATA[s_class]:
+                self._add_id(obj)
+            DATA[s_class][obj.id] = obj
+            self._index_add(obj)
+            self._persist('put', obj)
+
+    def put_many(self, cls, objs: List[TypeVar('Base')]):
+        """ Store several objects of a class and persist them at once
+
+        Nothing is stored if an unique attribute is already used, by
+        another stored object or inside `objs`.
+        """
+        s_class = cls.__name__
+        with LOCK:
+            objs_by_id = DATA.setdefault(s_class, {})
+            if INDEXES.get(s_class) is None:
+                self._reindex(cls)
+            try:
+                for obj in objs:
+                    self._check_unique(obj)
+                for attr, unique in cls.indexes.items():
+                    values = [getattr(obj, attr, None) for obj in objs]
+                    values = [value for value in values if value is not None]
+                    if unique and len(set(values)) != len(values):
+                        raise ValueError("{} already exists".format(attr))
+            except ValueError:
+                self._restore_indexed(objs)
+                raise
+            for obj in objs:
+                self._index_remove(obj)
+                if obj.id not in objs_by_id:
+                    self._add_id(obj)
+                objs_by_id[obj.id] = obj
+                self._index_add(obj)
+            self._persist_all('put', cls, objs)
+
+    def delete(self, obj: TypeVar('Base')):
+        """ Remove an object
+        """
+        s_class = obj.__class__.__name__
+        with LOCK:
+            stored = DATA.get(s_class, {}).get(obj.id)
+            if stored is None:
+                return
+            del DATA[s_class][obj.id]
+            if s_class in CREATED_PER_DAY:
+                self._count_created(s_class, stored.created_at, -1)
+            if INDEXES.get(s_class) is not None:
+                self._index_remove(obj)
+            if s_class in SORTED_IDS:
+                ids = SORTED_IDS[s_class]
+                del ids[bisect_left(ids, obj.id)]
+            self._persist('del', obj)
+
+    def count(self, cls) -> int:
+        """ Count all objects of a class
+        """
+        objs = DATA.get(cls.__name__, {})
+        if isinstance(objs, LazyObjects):
+            with LOCK:
+                return len(objs)
+        return len(objs)
+
+    def get(self, cls, id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        objs = DATA.get(cls.__name__, {})
+        if isinstance(objs, LazyObjects):
+            # materializing an object updates the mapping
+            with LOCK:
+                return objs.get(id)
+        return objs.get(id)
+
+    def page(self, cls, after: str = None,
+             limit: int = None) -> List[TypeVar('Base')]:
+        """ Return objects ordered by ID, starting after the ID `after`
+        """
+        s_class = cls.__name__
+        with LOCK:
+            objs = DATA.get(s_class, {})
+            if s_class not in SORTED_IDS:
+                SORTED_IDS[s_class] = sorted(objs)
+            ids = SORTED_IDS[s_class]
+            start = 0 if after is None else bisect_right(ids, after)
+            end = len(ids) if limit is None else start + limit
+            return [objs[obj_id] for obj_id in ids[start:end]]
+
+    def created_per_day(self, cls) -> dict:
+        """ Number of objects of a class created each day ("YYYY-MM-DD")
+        """
+        s_class = cls.__name__
+        with LOCK:
+            if s_class not in CREATED_PER_DAY:
+                CREATED_PER_DAY[s_class] = {}
+                objs = DATA.get(s_class, {})
+                for obj_id in objs:
+                    if isinstance(objs, LazyObjects) and \
+                            not objs.is_loaded(obj_id):
+                        # count the serialized object: don't materialize it
+                        created_at = datetime.fromisoformat(
+                            objs.raw(obj_id)['created_at'])
+                    else:
+                        created_at = objs[obj_id].created_at
+                    self._count_created(s_class, created_at, 1)
+            return dict(CREATED_PER_DAY[s_class])
+
+    def search(self, cls, attributes: dict = {}) -> List[TypeVar('Base')]:
+        """ Search all objects with matching attributes
+        """
+        s_class = cls.__name__
+
+        def _search(obj):
+            if len(attributes) == 0:
+                return True
+            for k, v in attributes.items():
+                if (getattr(obj, k) != v):
+                    return False
+            return True
+
+        with LOCK:
+            if INDEXES.get(s_class) is None:
+                self._reindex(cls)
+            objs = DATA.get(s_class, {})
+            candidates = None
+            for k, v in attributes.items():
+                if k not in cls.indexes:
+                    continue
+                try:
+                    ids = INDEXES[s_class][k].get(v, {})
+                except TypeError:
+                    # unhashable value: can't be in the index
+                    ids = {}
+                candidates = [objs[obj_id] for obj_id in ids]
+                break
+            if candidates is None:
+                candidates = list(objs.values())
+
+        return list(filter(_search, candidates))
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+""" Tests of the SQLite storage engine, each one on a temporary database
+
+Usage (from the project directory):
+python3 -m unittest models.engine.test_sqlite_storage
+"""
+from datetime import datetime
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import models.base
+from models.engine.sqlite_storage import SQLiteStorage
+from models.user import User
+
+
+def new_user(email: str, first_name: str = None) -> User:
+    """ Return a new User, not stored
+    """
+    user = User()
+    user.email = email
+    user.password = "pwd"
+    user.first_name = first_name
+    return user
+
+
+class TestSQLiteStorage(unittest.TestCase):
+    """ Tests of SQLiteStorage
+    """
+
+    def setUp(self):
+        """ Use an empty database in a temporary directory
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db_path = os.path.join(directory.name, "test.sqlite3")
+        self.storage = self.new_storage()
+        patcher = patch.object(models.base, "storage", self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def new_storage(self) -> SQLiteStorage:
+        """ Return a storage on the database, as a new process would
+        """
+        storage = SQLiteStorage(self.db_path)
+        self.addCleanup(lambda: storage._connection.close())
+        return storage
+
+    def query(self, sql: str, *values) -> list:
+        """ Rows of a query run on a connection of its own
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(sql, values).fetchall()
+
+    def test_upsert(self):
+        """ Saving a stored user updates its row and indexed columns
+        """
+        user = new_user("a@x", "A")
+        user.save()
+        user.first_name = "B"
+        user.save()
+        self.assertEqual(User.count(), 1)
+        self.assertEqual(self.query(
+            'SELECT email, first_name FROM "User"'), [("a@x", "B")])
+        self.assertEqual(User.search({"first_name": "A"}), [])
+        self.assertEqual(User.search({"first_name": "B"}), [user])
+        self.assertEqual(User.get(user.id).first_name, "B")
+
+    def test_unique(self):
+        """ An email already used is rejected, and a batch is stored in
+        one transaction
+        """
+        new_user("a@x").save()
+        with self.assertRaises(ValueError):
+            new_user("a@x").save()
+        for emails in (["b@x", "a@x"], ["c@x", "c@x"]):
+            with self.subTest(emails=emails):
+                with self.assertRaises(ValueError):
+                    User.save_many([new_user(email) for email in emails])
+                self.assertEqual([u.email for u in User.all()], ["a@x"])
+        User.save_many([new_user("b@x"), new_user("c@x")])
+        self.assertEqual([u.email for u in User.all()],
+                         ["a@x", "b@x", "c@x"])
+
+    def test_indexed_values_must_be_strings(self):
+        """ A non-string indexed value is rejected
+        """
+        user = new_user("a@x")
+        user.first_name = 1
+        with self.assertRaises(ValueError):
+            user.save()
+        self.assertEqual(User.count(), 0)
+
+    def test_triggers(self):
+        """ The triggers count the users created each day
+        """
+        day = datetime.utcnow().strftime("%Y-%m-%d")
+        users = [new_user("{}@x".format(i)) for i in range(3)]
+        old = User(id="old", created_at="2020-01-02T03:04:05.000000",
+                   updated_at="2020-01-02T03:04:05.000000")
+        User.save_many(users + [old])
+        self.assertEqual(User.created_per_day(), {"2020-01-02": 1, day: 3})
+        # updates aren't counted
+        users[0].save()
+        self.assertEqual(User.count(), 4)
+        old.remove()
+        users[1].remove()
+        self.assertEqual(User.created_per_day(), {day: 2})
+        self.assertEqual(self.query('SELECT day, count FROM "User_created"'),
+                         [(day, 2)])
+        self.assertEqual(User.count(), 2)
+
+    def test_counters_backfilled(self):
+        """ Users stored before the triggers existed are counted
+        """
+        User.save_many([new_user("{}@x".format(i)) for i in range(3)])
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('DROP TRIGGER "User_insert"')
+            conn.execute('DROP TRIGGER "User_delete"')
+            conn.execute('DELETE FROM "User_created"')
+            conn.execute('INSERT INTO "User" (id, data, email) '
+                         "SELECT id || '-copy', data, email || '-copy' "
+                         'FROM "User"')
+        storage = self.new_storage()
+        self.assertEqual(storage.count(User), 6)
+        new_user("3@x").save()
+        self.assertEqual(storage.count(User), 7)
+
+    def test_shared_between_storages(self):
+        """ Every storage on the file sees the committed changes
+        """
+        user = new_user("a@x", "A")
+        user.save()
+        storage = self.new_storage()
+        self.assertEqual(storage.get(User, user.id).email, "a@x")
+        self.assertEqual(storage.search(User, {"email": "a@x"}), [user])
+        storage.delete(user)
+        self.assertIsNone(User.get(user.id))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,6 +9,11 @@ class User(Base):
     """ User class
     """
 
+    __slots__ = ('email', '_password', 'first_name', 'last_name')
+
+    fields = Base.fields + __slots__
+    indexes = {'email': True, 'first_name': False}
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
         """
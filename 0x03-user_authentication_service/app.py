@@ -2,9 +2,12 @@
 """A simple Flask app with user authentication features.
 """
 import logging
+import os
+import time
 
-from flask import Flask, abort, jsonify, redirect, request
+from flask import Flask, Response, abort, jsonify, redirect, request
 
+import instrumentation
 from auth import Auth
 
 logging.disable(logging.WARNING)
@@ -12,6 +15,35 @@ logging.disable(logging.WARNING)
 
 AUTH = Auth()
 app = Flask(__name__)
+# the metrics reveal authentication failures and timings: without
+# METRICS_PUBLIC, they require a session
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "0").lower() in (
+    "1", "true", "yes")
+
+
+@app.before_request
+def before_request() -> None:
+    """Counts the request and starts timing it."""
+    request.start_time = time.perf_counter()
+    instrumentation.requests.increment()
+
+
+@app.after_request
+def after_request(response):
+    """Records the duration of the request and the authentication failures.
+
+    Args:
+        response: The response of the request.
+
+    Returns:
+        The same response.
+    """
+    if response.status_code in (401, 403):
+        instrumentation.auth_failures.increment()
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    instrumentation.request_duration.observe(
+        time.perf_counter() - request.start_time, request.method, route)
+    return response
 
 
 @app.route("/", methods=["GET"], strict_slashes=False)
@@ -140,5 +172,21 @@ def update_password() -> str:
     return jsonify({"email": email, "message": "Password updated"})
 
 
+@app.route("/metrics", methods=["GET"], strict_slashes=False)
+def metrics() -> str:
+    """GET /metrics
+    Return:
+        - The counters and the histograms of the app in the Prometheus
+          text format.
+        - 403 if METRICS_PUBLIC isn't set and the session ID is invalid.
+    """
+    if not METRICS_PUBLIC:
+        session_id = request.cookies.get("session_id")
+        if AUTH.get_user_from_session_id(session_id) is None:
+            abort(403)
+    return Response(instrumentation.render_metrics(),
+                    mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port="5000")
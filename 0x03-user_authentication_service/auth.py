@@ -10,6 +10,7 @@ from uuid import uuid4
 import bcrypt
 from sqlalchemy.orm.exc import NoResultFound
 
+import instrumentation
 from db import DB
 from user import User
 
@@ -81,15 +82,18 @@ class Auth:
             bool: True if the email and password match a registered user,
             False otherwise.
         """
+        stage_timer = instrumentation.auth_stage_duration.timer
         try:
             # Locate the user by email
-            user = self._db.find_user_by(email=email)
+            with stage_timer("user_search"):
+                user = self._db.find_user_by(email=email)
             if user is not None:
                 # Check if the password matches using bcrypt
                 password_bytes = password.encode("utf-8")
                 hashed_password = user.hashed_password
-                if bcrypt.checkpw(password_bytes, hashed_password):
-                    return True
+                with stage_timer("password_check"):
+                    if bcrypt.checkpw(password_bytes, hashed_password):
+                        return True
         except NoResultFound:
             return False
         return False
@@ -134,7 +138,8 @@ class Auth:
         try:
             # Attempt to retrieve the user object corresponding to the session
             # ID from the database
-            user = self._db.find_user_by(session_id=session_id)
+            with instrumentation.auth_stage_duration.timer("session_lookup"):
+                user = self._db.find_user_by(session_id=session_id)
         except NoResultFound:
             # If no user object is found, return None
             return None
@@ -11,6 +11,7 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.orm.session import Session
 
+import instrumentation
 from user import Base, User
 
 logging.disable(logging.WARNING)
@@ -48,7 +49,8 @@ class DB:
         new_user = User(email=email, hashed_password=hashed_password)
         try:
             self._session.add(new_user)
-            self._session.commit()
+            with instrumentation.persistence_duration.timer("add_user"):
+                self._session.commit()
         except Exception as e:
             print(f"Error adding user to database: {e}")
             self._session.rollback()
@@ -106,7 +108,8 @@ class DB:
 
         try:
             # Commit changes to the database
-            self._session.commit()
+            with instrumentation.persistence_duration.timer("update_user"):
+                self._session.commit()
         except InvalidRequestError:
             # Raise error if an invalid request is made
             raise ValueError("Invalid request")